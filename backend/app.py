@@ -1,45 +1,324 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, redirect, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_jwt_extended import (
     JWTManager, jwt_required, create_access_token,
     get_jwt_identity, get_jwt
 )
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
-import cloudinary.uploader
-import cloudinary_config
-import bcrypt
 import base64
+import hashlib
+import io
+import threading
 
 
 
 # Import your MongoDB helper functions
-from database import get_database, get_original_data_collection, get_users_collection, get_certificates_collection, db_connection
+from database import collection, get_original_data_collection, get_users_collection, get_certificates_collection, db_connection
+from lookups import attach_user_details
+from pagination import InvalidPageRequest, paginate, parse_page_args
+from original_registry import get_original_registry
+from file_hash import sha256_of_stream
+from similarity_index import get_similarity_index
+from upload_jobs import get_upload_queue
+from storage import get_storage
+from chunked_uploads import ChunkedUploadError, ChunkedUploads
+from passwords import MAX_PASSWORD_BYTES, PasswordHasherBusy, get_password_hasher
+from versions import CERTIFICATES_SCOPE, VersionMarkers, user_scope
+from stats import ROLLUP_GRANULARITIES, CertificateStats
+from import_originals import import_rows, iter_sheet
+from search import decode_offset, encode_offset, search_certificates, user_search_fields
+from extraction import compare_claims
+from extraction_pipeline import EXTRACTION_ENABLED, ExtractionPipeline
+from thumbnails import DERIVATIVE_KINDS
+from export import EXPORT_BATCH_SIZE, EXPORT_PROJECTION, csv_chunks, iter_batches, ndjson_chunks
+from rate_limit import client_ip, current_user, get_rate_limiter, limit, login_account
+import metrics
+import query_trace
 
 # ────────────────────────────────
 # Setup
 # ────────────────────────────────
+# Importing this module never touches Mongo or Cloudinary: collections are
+# lazy, per-process handles and the in-memory indexes are warmed by
+# `start_background_services` once the serving process is running.
+# Indexes and the admin user are created by `bootstrap_db.py`.
 load_dotenv()
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}},
-     supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
-
-app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "secret123")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=1)
-jwt = JWTManager(app)
+api = Blueprint("api", __name__)
 
 users_collection = get_users_collection()
 certificates_collection = get_certificates_collection()
 original_data_collection = get_original_data_collection()
+derivatives_collection = collection("derivatives")
+
+# Known Original_data public_ids, so fake certificates never reach Mongo
+original_registry = get_original_registry()
+
+# Perceptual hashes of originals for near-duplicate / altered-copy lookups
+similarity_index = get_similarity_index()
+
+# Per-collection / per-user change counters behind the list and detail ETags
+version_markers = VersionMarkers(collection("versions"))
+
+# Dashboard counters and hourly/daily rollups, updated on every write
+certificate_stats = CertificateStats(collection("stats"), collection("stats_rollups"))
+
+# bcrypt runs in a bounded process pool, not on the request thread
+password_hasher = get_password_hasher()
+
+# Certificate file storage engine (Cloudinary or local disk)
+storage = metrics.instrument_storage(get_storage())
+
+# Resumable chunked uploads (init / PUT chunk / complete)
+chunked_uploads = ChunkedUploads(collection("upload_sessions"))
+
+# Text / metadata extraction for claim checks, off the request path
+extraction_pipeline = ExtractionPipeline(
+    certificates_collection, collection("extractions"), storage, derivatives_collection
+)
+extraction_pipeline.on_certificates_change = lambda user_ids: certificates_changed(user_ids)
+
+# Background pool for asynchronous (202 Accepted) uploads
+upload_queue = get_upload_queue()
+upload_queue.on_certificate_change = lambda user_id, old, new: upload_job_finished(user_id, old, new)
+ASYNC_UPLOADS_DEFAULT = os.getenv("UPLOAD_MODE", "sync").lower() == "async"
+
+_services_pid = None
+_services_lock = threading.Lock()
+
+
+def start_background_services():
+    """Warm the in-memory indexes once per serving process.
+
+    Runs in a background thread on the first request after start (or after
+    fork), so no worker blocks on it: until the registry is loaded every
+    lookup falls through to Mongo, exactly as with the registry disabled.
+    """
+    global _services_pid
+    with _services_lock:
+        if _services_pid == os.getpid():
+            return
+        _services_pid = os.getpid()
+
+    def warm():
+        original_registry.start(original_data_collection, version_markers)
+        similarity_index.start(original_data_collection, version_markers)
+        if os.getenv("UPLOAD_RECOVER_ON_START", "false").lower() in ("1", "true", "yes"):
+            upload_queue.recover(certificates_collection, storage)
+        if EXTRACTION_ENABLED:
+            extraction_pipeline.start()
+        chunked_uploads.start_sweeper()
+
+    threading.Thread(target=warm, name="startup-warm", daemon=True).start()
+
+
+@api.before_app_request
+def ensure_background_services():
+    if _services_pid != os.getpid():
+        start_background_services()
+
+
+# List endpoints never ship large legacy fields such as base64 `file_data`
+CERTIFICATE_LIST_PROJECTION = {"file_data": 0}
+USER_LIST_PROJECTION = {"password": 0}
+
+
+def page_response(items, next_cursor, etag=None):
+    """JSON list response with the keyset cursor for the next page"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if etag:
+        response.set_etag(etag)
+    return response, 200
+
+
+def not_modified(etag):
+    """304 response if the client already holds `etag`, else None"""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def certificates_changed(user_ids):
+    """Called after any write that changes certificates owned by `user_ids`"""
+    try:
+        version_markers.bump_certificates(user_ids)
+    except Exception as e:
+        print(f"⚠️  Version bump failed: {e}")
+
+
+def certificate_added(user_id, status):
+    try:
+        certificate_stats.record_upload(user_id, status)
+    except Exception as e:
+        print(f"⚠️  Stats update failed: {e}")
+    certificates_changed([user_id])
+    if status != "uploading":
+        extraction_pipeline.notify()
+
+
+def certificate_statuses_changed(changes):
+    """`changes` is a list of (user_id, old_status, new_status)"""
+    try:
+        certificate_stats.record_status_changes(changes)
+    except Exception as e:
+        print(f"⚠️  Stats update failed: {e}")
+    certificates_changed([user_id for user_id, _, _ in changes])
+
+
+def set_certificate_status(cert_id, status, fields=None):
+    """Set a certificate's status and record the transition the write actually made.
+
+    Returns the certificate as it was just before the write, or None if it
+    no longer exists; a concurrent or repeated review sees the status the
+    other one left and so is never counted twice.
+    """
+    before = certificates_collection.find_one_and_update(
+        {"_id": cert_id},
+        {"$set": {"status": status, "reviewed_at": datetime.utcnow(), **(fields or {})}},
+        projection={"user_id": 1, "status": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before:
+        certificate_statuses_changed([(before.get("user_id"), before.get("status"), status)])
+    return before
+
+
+def upload_job_finished(user_id, old_status, new_status):
+    """Called by the upload pool when an async upload lands or fails"""
+    certificate_statuses_changed([(user_id, old_status, new_status)])
+    extraction_pipeline.notify()
+
+
+def certificate_debug(cert):
+    """Certificate summary returned by the verify endpoints"""
+    return {
+        "cert_id": str(cert.get("_id")),
+        "public_id": cert.get("public_id"),
+        "file_name": cert.get("file_name"),
+        "title": cert.get("title"),
+        "status": cert.get("status"),
+    }
+
+
+def original_match_debug(original):
+    """`Original_data` match summary returned by the verify endpoints"""
+    if not original:
+        return None
+    return {
+        "original_id": str(original.get("_id")),
+        "public_id": original.get("public_id"),
+        "file_name": original.get("file_name"),
+        "title": original.get("title")
+    }
+
+
+def original_match_query(certs):
+    """Original_data query matching certificates by public_id or sha256.
+
+    Keys the in-process registry knows are absent are left out; returns
+    None when nothing is left to look up.
+    """
+    public_ids = [
+        c["public_id"] for c in certs
+        if c.get("public_id") and original_registry.might_contain(c["public_id"])
+    ]
+    hashes = [
+        c["sha256"] for c in certs
+        if c.get("sha256") and original_registry.might_contain_hash(c["sha256"])
+    ]
+
+    clauses = []
+    if public_ids:
+        clauses.append({"public_id": {"$in": public_ids}})
+    if hashes:
+        clauses.append({"sha256": {"$in": hashes}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def claims_check(cert, original=None):
+    """Compare a certificate's extracted claims with its Original_data row.
+
+    Uses the row already matched by public_id / hash, else looks one up by
+    the extracted roll number (indexed). None until extraction has run.
+    """
+    extracted = cert.get("extracted")
+    if not extracted:
+        return None
+    if original is None and extracted.get("roll_no"):
+        original = original_data_collection.find_one({"roll_no": extracted["roll_no"]})
+    if original is None:
+        return {"fields": {}, "matched": None, "original_id": None}
+    return {**compare_claims(extracted, original), "original_id": str(original["_id"])}
+
+
+def certificate_filters(args):
+    """Build a certificates query from the `status` / `user_id` filters"""
+    query = {}
+    if args.get("status"):
+        query["status"] = args["status"]
+    if args.get("user_id"):
+        query["user_id"] = args["user_id"]
+    return query
+
+# ────────────────────────────────
+# HEALTH
+# ────────────────────────────────
+@api.route("/api/health", methods=["GET"])
+def health_check():
+    """Answered from cached heartbeat state.
+
+    Only the first call in a process, before the driver's first heartbeat,
+    waits on a ping (bounded by the server selection timeout).
+    """
+    db_connected = db_connection.check_connection()
+    return jsonify({
+        "status": "healthy" if db_connected else "degraded",
+        "database": "connected" if db_connected else "disconnected",
+        "last_heartbeat": db_connection.health.state()["last_heartbeat"],
+        "timestamp": datetime.utcnow().isoformat(),
+    }), 200 if db_connected else 503
+
+
+@api.route("/api/admin/db/stats", methods=["GET"])
+@jwt_required()
+def database_stats():
+    """Connection pool usage, for sizing worker and pool counts"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    return jsonify(db_connection.stats()), 200
+
+
+@api.route("/api/admin/query-traces", methods=["GET"])
+@jwt_required()
+def recent_query_traces():
+    """Most recent traced requests (QUERY_TRACE=sample|all), newest first"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    traces = list(query_trace.recent_traces)
+    traces.reverse()
+    if request.args.get("flagged", "").lower() in ("1", "true", "yes"):
+        traces = [t for t in traces if t["collscans"] or t["in_memory_sorts"]]
+    return jsonify({"mode": query_trace.QUERY_TRACE, "traces": traces}), 200
 
 # ────────────────────────────────
 # AUTH
 # ────────────────────────────────
-@app.route("/api/register", methods=["POST"])
+@api.route("/api/register", methods=["POST"])
+@limit(("register_ip", client_ip), concurrency="auth")
 def register():
     data = request.get_json()
     name, email, password = data.get("name"), data.get("email"), data.get("password")
@@ -47,24 +326,48 @@ def register():
 
     if not (name and email and password):
         return jsonify({"error": "All fields required"}), 400
+    if len(password.encode("utf-8")) > MAX_PASSWORD_BYTES:
+        return jsonify({"error": f"Password must be at most {MAX_PASSWORD_BYTES} bytes"}), 400
     if users_collection.find_one({"email": email}):
         return jsonify({"error": "Email already exists"}), 400
 
-    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-    user = {"name": name, "email": email, "password": hashed_pw, "role": role}
+    try:
+        hashed_pw = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return jsonify({"error": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
+    user = {"name": name, "email": email, "password": hashed_pw, "role": role, **user_search_fields(name, email)}
     users_collection.insert_one(user)
     return jsonify({"message": "User registered successfully"}), 201
 
 
-@app.route("/api/login", methods=["POST"])
+@api.route("/api/login", methods=["POST"])
+@limit(("login_ip", client_ip), ("login_account", login_account), concurrency="auth")
 def login():
     data = request.get_json()
     email, password = data.get("email"), data.get("password")
 
-    user = users_collection.find_one({"email": email})
-    if not user or not bcrypt.checkpw(password.encode("utf-8"), user["password"]):
+    # Over-long passwords can never match; don't spend a bcrypt round on them
+    if not email or not password or len(password.encode("utf-8")) > MAX_PASSWORD_BYTES:
         return jsonify({"error": "Invalid credentials"}), 401
 
+    user = users_collection.find_one({"email": email})
+    try:
+        if not user or not password_hasher.check(password, user["password"]):
+            return jsonify({"error": "Invalid credentials"}), 401
+    except PasswordHasherBusy:
+        return jsonify({"error": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
+
+    # Upgrade hashes made with a lower cost than currently configured; the
+    # login already succeeded, so a busy hasher just defers it to next time
+    if password_hasher.needs_rehash(user["password"]):
+        try:
+            users_collection.update_one(
+                {"_id": user["_id"], "password": user["password"]},
+                {"$set": {"password": password_hasher.hash(password)}}
+            )
+        except PasswordHasherBusy:
+            pass
+
     access_token = create_access_token(
         identity=str(user["_id"]),
         additional_claims={
@@ -87,8 +390,9 @@ def login():
 # ────────────────────────────────
 # USER CERTIFICATES
 # ────────────────────────────────
-@app.route("/api/certificates", methods=["POST"])
+@api.route("/api/certificates", methods=["POST"])
 @jwt_required()
+@limit(("upload_user", current_user), concurrency="upload")
 def upload_certificate():
     try:
         claims = get_jwt()
@@ -101,84 +405,416 @@ def upload_certificate():
         if not file or not title:
             return jsonify({"error": "Missing file or title"}), 400
 
-        # Upload file to Cloudinary
-        upload_result = cloudinary.uploader.upload(
-            file,
-            folder="academic_certificates",
-            resource_type="auto"   # auto handles PDF, PNG, JPG etc.
-        )
-#   upload_dir = "uploads"
-#     os.makedirs(upload_dir, exist_ok=True)
-#     file_path = os.path.join(upload_dir, file.filename)
-#     file.save(file_path)
+        # Same bytes already stored? Reuse that object instead of re-uploading
+        file_sha256 = sha256_of_stream(file.stream)
+        existing = find_stored_duplicate(file_sha256)
 
         # Insert into MongoDB
         certificate = {
             "user_id": user_id,
             "title": title,
             "file_name": file.filename,        # original name
-            "certificate_url": upload_result["secure_url"], # CLOUDINARY URL
-            "public_id": upload_result["public_id"],        # for delete/update
+            "content_type": file.mimetype,
+            "sha256": file_sha256,             # content hash for dedup/verify
             "status": "pending",
+            "extraction_status": "pending",   # extraction pipeline adds claims and phash
             "uploaded_at": datetime.utcnow(),
         }
 
+        run_async = request.args.get("async", str(ASYNC_UPLOADS_DEFAULT)).lower() in ("1", "true", "yes")
+
+        if existing:
+            reuse_stored_file(certificate, existing)
+
+        elif run_async:
+            # Spool locally and let the upload pool push it to storage
+            if not upload_queue.reserve():
+                return jsonify({"error": "Upload queue is full, try again shortly"}), 503, {"Retry-After": "5"}
+            try:
+                certificate["spool_path"] = upload_queue.spool(file)
+                certificate["status"] = "uploading"
+                # Owned by this process, so other workers' recovery leaves it alone
+                certificate.update(upload_queue.claim_fields())
+                result = certificates_collection.insert_one(certificate)
+            except Exception:
+                upload_queue.release()
+                raise
+            certificate_added(user_id, certificate["status"])
+            upload_queue.submit(
+                certificates_collection, storage,
+                result.inserted_id, certificate["spool_path"], file_sha256
+            )
+
+            job_id = str(result.inserted_id)
+            return jsonify({
+                "message": "Certificate upload accepted",
+                "job_id": job_id,
+                "status_url": f"/api/uploads/{job_id}"
+            }), 202
+
+        else:
+            # Upload file to the configured storage engine
+            stored = storage.put(file, file.filename, file_sha256)
+            certificate["certificate_url"] = stored["url"]
+            certificate["public_id"] = stored["key"]      # for delete/update
+            certificate["storage"] = storage.name
+
         certificates_collection.insert_one(certificate)
+        certificate_added(user_id, certificate["status"])
 
         return jsonify({
             "message": "Certificate uploaded successfully",
-            "certificate_url": upload_result["secure_url"]
+            "certificate_url": certificate["certificate_url"],
+            "deduplicated": bool(existing)
         }), 201
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/certificates", methods=["GET"])
+def find_stored_duplicate(file_sha256):
+    """An already stored certificate with identical content, if any"""
+    return certificates_collection.find_one(
+        {"sha256": file_sha256, "public_id": {"$exists": True}},
+        {"public_id": 1, "certificate_url": 1, "storage": 1}
+    )
+
+
+def reuse_stored_file(certificate, existing):
+    certificate["certificate_url"] = existing["certificate_url"]
+    certificate["public_id"] = existing["public_id"]
+    certificate["storage"] = existing.get("storage", "cloudinary")
+
+
+@api.route("/api/uploads/chunked", methods=["POST"])
+@jwt_required()
+@limit(("upload_user", current_user))
+def create_chunked_upload():
+    """
+    Opens a resumable upload.
+    Body: {"title", "file_name", "total_size", "content_type"?}
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+
+    if not data.get("title") or not data.get("file_name"):
+        return jsonify({"error": "Missing file_name or title"}), 400
+
+    try:
+        session = chunked_uploads.create(
+            user_id, data["title"], data["file_name"],
+            data.get("total_size"), data.get("content_type")
+        )
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    upload_id = str(session["_id"])
+    return jsonify({
+        "upload_id": upload_id,
+        "offset": 0,
+        "total_size": session["total_size"],
+        "max_chunk_size": chunked_uploads.max_chunk,
+        "upload_url": f"/api/uploads/chunked/{upload_id}",
+    }), 201
+
+
+@api.route("/api/uploads/chunked/<upload_id>", methods=["GET"])
+@jwt_required()
+def get_chunked_upload(upload_id):
+    """Current offset, so an interrupted client knows where to resume"""
+    if not ObjectId.is_valid(upload_id):
+        return jsonify({"error": "Invalid upload ID"}), 400
+
+    try:
+        session = chunked_uploads.get(ObjectId(upload_id), get_jwt_identity())
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    return jsonify({
+        "upload_id": upload_id,
+        "offset": session["received"],
+        "total_size": session["total_size"],
+        "status": session["status"],
+        "certificate_id": str(session["certificate_id"]) if session.get("certificate_id") else None,
+    }), 200
+
+
+@api.route("/api/uploads/chunked/<upload_id>", methods=["PUT"])
+@jwt_required()
+@limit(concurrency="upload")
+def put_chunked_upload(upload_id):
+    """Writes the raw request body at `?offset=`; returns the new offset"""
+    if not ObjectId.is_valid(upload_id):
+        return jsonify({"error": "Invalid upload ID"}), 400
+
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"error": "offset query parameter required"}), 400
+
+    try:
+        new_offset = chunked_uploads.write_chunk(
+            ObjectId(upload_id), get_jwt_identity(), offset,
+            request.stream, request.content_length
+        )
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    return jsonify({"upload_id": upload_id, "offset": new_offset}), 200
+
+
+@api.route("/api/uploads/chunked/<upload_id>/complete", methods=["POST"])
+@jwt_required()
+@limit(concurrency="upload")
+def complete_chunked_upload(upload_id):
+    """Stores the assembled file and creates the certificate"""
+    if not ObjectId.is_valid(upload_id):
+        return jsonify({"error": "Invalid upload ID"}), 400
+
+    try:
+        session, file_sha256 = chunked_uploads.finish(ObjectId(upload_id), get_jwt_identity())
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    result = None
+    try:
+        certificate = {
+            "user_id": session["user_id"],
+            "title": session["title"],
+            "file_name": session["file_name"],
+            "content_type": session.get("content_type"),
+            "sha256": file_sha256,
+            "file_size": session["total_size"],
+            "status": "pending",
+            "extraction_status": "pending",   # extraction pipeline adds claims and phash
+            "uploaded_at": datetime.utcnow(),
+        }
+
+        existing = find_stored_duplicate(file_sha256)
+        if existing:
+            reuse_stored_file(certificate, existing)
+        else:
+            stored = storage.put(session["path"], session["file_name"], file_sha256)
+            certificate["certificate_url"] = stored["url"]
+            certificate["public_id"] = stored["key"]
+            certificate["storage"] = storage.name
+
+        result = certificates_collection.insert_one(certificate)
+        chunked_uploads.close(session, result.inserted_id)
+        certificate_added(session["user_id"], certificate["status"])
+
+        return jsonify({
+            "message": "Certificate uploaded successfully",
+            "certificate_id": str(result.inserted_id),
+            "certificate_url": certificate["certificate_url"],
+            "sha256": file_sha256,
+            "deduplicated": bool(existing)
+        }), 201
+
+    except Exception as e:
+        if result is None:
+            # Nothing was created; let the client retry the complete
+            chunked_uploads.reopen(session)
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route("/api/uploads/<job_id>", methods=["GET"])
+@jwt_required()
+def upload_job_status(job_id):
+    """Status of an asynchronous upload; the job id is the certificate id"""
+    user_id = get_jwt_identity()
+    claims = get_jwt()
+
+    if not ObjectId.is_valid(job_id):
+        return jsonify({"error": "Invalid job ID"}), 400
+
+    cert = certificates_collection.find_one(
+        {"_id": ObjectId(job_id)},
+        {"user_id": 1, "status": 1, "certificate_url": 1, "upload_error": 1}
+    )
+    if not cert:
+        return jsonify({"error": "Upload job not found"}), 404
+    if claims.get("role") != "admin" and cert.get("user_id") != user_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    state = {"uploading": "uploading", "upload_failed": "failed"}.get(cert.get("status"), "done")
+    return jsonify({
+        "job_id": job_id,
+        "state": state,
+        "certificate_status": cert.get("status"),
+        "certificate_url": cert.get("certificate_url"),
+        "error": cert.get("upload_error"),
+    }), 200
+
+
+@api.route("/api/admin/uploads/stats", methods=["GET"])
+@jwt_required()
+def upload_queue_stats():
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    return jsonify(upload_queue.stats()), 200
+
+
+@api.route("/api/certificates", methods=["GET"])
 @jwt_required()
 def get_user_certificates():
     user_id = get_jwt_identity()
     claims = get_jwt()
     role = claims.get("role")
 
-    if role == "admin":
-        certs = list(certificates_collection.find())
-    else:
-        certs = list(certificates_collection.find({"user_id": user_id}))
+    query = certificate_filters(request.args)
+    if role != "admin":
+        query["user_id"] = user_id
+
+    # Admins see every certificate; users only their own
+    scope = CERTIFICATES_SCOPE if role == "admin" else user_scope(user_id)
+    etag = version_markers.etag(scope, "list", role, user_id, request.query_string.decode())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    try:
+        limit, after = parse_page_args(request.args, "uploaded_at")
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
+    certs, next_cursor = paginate(
+        certificates_collection, query, CERTIFICATE_LIST_PROJECTION,
+        limit, after, sort_field="uploaded_at"
+    )
 
     for c in certs:
         c["_id"] = str(c["_id"])
         c["uploaded_at"] = c.get("uploaded_at", datetime.utcnow()).isoformat()
-    return jsonify(certs), 200
+        c.setdefault("thumbnail_url", None)   # set once the derivative pipeline has run
+    return page_response(certs, next_cursor, etag)
 
 # ────────────────────────────────
 # ADMIN ROUTES
 # ────────────────────────────────
-@app.route("/api/admin/certificates", methods=["GET"])
+@api.route("/api/admin/certificates", methods=["GET"])
 @jwt_required()
 def get_all_certificates_admin():
     claims = get_jwt()
     if claims.get("role") != "admin":
         return jsonify({"error": "Admin access required"}), 403
 
-    certs = list(certificates_collection.find())
+    etag = version_markers.etag(CERTIFICATES_SCOPE, "admin-list", request.query_string.decode())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    try:
+        limit, after = parse_page_args(request.args, "uploaded_at")
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
+    certs, next_cursor = paginate(
+        certificates_collection, certificate_filters(request.args),
+        CERTIFICATE_LIST_PROJECTION, limit, after, sort_field="uploaded_at"
+    )
     for cert in certs:
         cert["_id"] = str(cert["_id"])
         cert["uploaded_at"] = cert.get("uploaded_at", datetime.utcnow()).isoformat()
+        cert.setdefault("thumbnail_url", None)
 
-        try:
-            user_obj_id = ObjectId(cert["user_id"])
-            user = users_collection.find_one({"_id": user_obj_id})
-        except Exception:
-            user = users_collection.find_one({"_id": cert["user_id"]})
+    # One batched users query for the whole page instead of one per certificate
+    attach_user_details(certs, users_collection)
+
+    return page_response(certs, next_cursor, etag)
 
-        cert["user_name"] = user["name"] if user else "Unknown"
-        cert["user_email"] = user["email"] if user else "Unknown"
 
-    return jsonify(certs), 200
+def parse_date_range(args):
+    """`uploaded_at` condition from ISO `from` / `to` args, or None"""
+    condition = {}
+    for arg, op in (("from", "$gte"), ("to", "$lte")):
+        if args.get(arg):
+            try:
+                condition[op] = datetime.fromisoformat(args[arg])
+            except ValueError:
+                raise InvalidPageRequest(f"{arg} must be an ISO date")
+    return condition or None
 
 
-@app.route("/api/admin/certificates/<cert_id>/verify", methods=["PUT"])
+@api.route("/api/admin/certificates/search", methods=["GET"])
+@jwt_required()
+def search_certificates_admin():
+    """Ranked search by title, file name or owner, with status/date filters"""
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    q = (request.args.get("q") or "").strip()
+    try:
+        filters = certificate_filters(request.args)
+        uploaded_at = parse_date_range(request.args)
+        if uploaded_at:
+            filters["uploaded_at"] = uploaded_at
+
+        if q:
+            limit, _ = parse_page_args({"limit": request.args.get("limit", 50)})
+            offset = decode_offset(request.args["after"]) if request.args.get("after") else 0
+            certs, next_offset = search_certificates(
+                certificates_collection, users_collection, q, filters,
+                CERTIFICATE_LIST_PROJECTION, limit, offset
+            )
+            next_cursor = encode_offset(next_offset) if next_offset is not None else None
+        else:
+            limit, after = parse_page_args(request.args, "uploaded_at")
+            certs, next_cursor = paginate(
+                certificates_collection, filters,
+                CERTIFICATE_LIST_PROJECTION, limit, after, sort_field="uploaded_at"
+            )
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
+    for cert in certs:
+        cert["_id"] = str(cert["_id"])
+        cert["uploaded_at"] = cert.get("uploaded_at", datetime.utcnow()).isoformat()
+        cert.setdefault("thumbnail_url", None)
+    attach_user_details(certs, users_collection)
+
+    return page_response(certs, next_cursor)
+
+
+@api.route("/api/admin/certificates/export", methods=["GET"])
+@jwt_required()
+@limit(("export_user", current_user), concurrency="export")
+def export_certificates():
+    """
+    Streams every certificate as NDJSON (default) or CSV.
+    Rows are read from the cursor and written out batch by batch, so memory
+    stays constant regardless of how many certificates are exported.
+    """
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    cursor = certificates_collection.find(
+        certificate_filters(request.args), EXPORT_PROJECTION
+    ).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    batches = iter_batches(cursor, users_collection)
+
+    if fmt == "csv":
+        body, mimetype = csv_chunks(batches), "text/csv"
+    else:
+        body, mimetype = ndjson_chunks(batches), "application/x-ndjson"
+
+    filename = f"certificates-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@api.route("/api/admin/certificates/<cert_id>/verify", methods=["PUT"])
 @jwt_required()
 def update_certificate_status(cert_id):
     print("🔵 API HIT: certificates route")
@@ -202,62 +838,50 @@ def update_certificate_status(cert_id):
             return jsonify({"error": "Certificate not found"}), 404
 
         # Debug info
-        cert_debug = {
-            "cert_id": str(cert.get("_id")),
-            "public_id": cert.get("public_id"),
-            "file_name": cert.get("file_name"),
-            "title": cert.get("title"),
-            "status": cert.get("status"),
-        }
+        cert_debug = certificate_debug(cert)
 
         # Direct reject
         if status == "rejected":
-            certificates_collection.update_one(
-                {"_id": cert_obj_id},
-                {"$set": {"status": "rejected"}}
-            )
+            if not set_certificate_status(cert_obj_id, "rejected"):
+                return jsonify({"error": "Certificate not found"}), 404
             return jsonify({
                 "message": "Certificate rejected",
                 "certificate": cert_debug,
                 "original_data_match": None
             }), 200
 
-        # VERIFY — MATCH USING PUBLIC ID
-        original = original_data_collection.find_one({
-            "public_id": cert.get("public_id")
-        })
+        # VERIFY — MATCH USING PUBLIC ID OR CONTENT HASH
+        original = None
+        match = original_match_query([cert])
+        if match:
+            original = original_data_collection.find_one(match)
 
-        original_debug = None
-        if original:
-            original_debug = {
-                "original_id": str(original.get("_id")),
-                "public_id": original.get("public_id"),
-                "file_name": original.get("file_name"),
-                "title": original.get("title")
-            }
+        original_debug = original_match_debug(original)
+
+        # Extracted claims (name, course, dates) vs the registry row; reported
+        # to the reviewer, the decision itself still rests on the match above
+        claim_result = claims_check(cert, original)
 
         # MATCH FOUND → VERIFIED
         if original:
-            certificates_collection.update_one(
-                {"_id": cert_obj_id},
-                {"$set": {"status": "verified"}}
-            )
+            if not set_certificate_status(cert_obj_id, "verified", {"claims_check": claim_result}):
+                return jsonify({"error": "Certificate not found"}), 404
             return jsonify({
                 "message": "Certificate verified successfully",
                 "certificate": cert_debug,
-                "original_data_match": original_debug
+                "original_data_match": original_debug,
+                "claims_check": claim_result
             }), 200
 
         # NOT FOUND → REJECTED
         else:
-            certificates_collection.update_one(
-                {"_id": cert_obj_id},
-                {"$set": {"status": "rejected"}}
-            )
+            if not set_certificate_status(cert_obj_id, "rejected", {"claims_check": claim_result}):
+                return jsonify({"error": "Certificate not found"}), 404
             return jsonify({
                 "message": "FAKE certificate! Rejected",
                 "certificate": cert_debug,
-                "original_data_match": None
+                "original_data_match": None,
+                "claims_check": claim_result
             }), 200
 
 
@@ -266,23 +890,289 @@ def update_certificate_status(cert_id):
 
 
 
-@app.route("/api/admin/users", methods=["GET"])
+MAX_BULK_VERIFY = 5000
+
+
+@api.route("/api/admin/certificates/verify", methods=["PUT"])
+@jwt_required()
+def bulk_update_certificate_status():
+    """
+    Verifies or rejects many certificates at once.
+    Body: {"ids": [...], "status": "verified" | "rejected"}
+    Uses one $in query for certificates, one for Original_data and a single
+    bulk_write, and returns a per-id result shaped like the single endpoint.
+    """
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    try:
+        data = request.get_json() or {}
+        status = data.get("status")
+        ids = data.get("ids")
+
+        if status not in ["verified", "rejected"]:
+            return jsonify({"error": "Invalid status"}), 400
+        if not isinstance(ids, list) or not ids:
+            return jsonify({"error": "ids must be a non-empty list"}), 400
+        if len(ids) > MAX_BULK_VERIFY:
+            return jsonify({"error": f"At most {MAX_BULK_VERIFY} ids per request"}), 400
+
+        results = {}
+        obj_ids = {}
+        for cert_id in ids:
+            if ObjectId.is_valid(cert_id):
+                obj_ids[cert_id] = ObjectId(cert_id)
+            else:
+                results[cert_id] = {"id": cert_id, "error": "Invalid certificate ID"}
+
+        certs = {
+            str(c["_id"]): c
+            for c in certificates_collection.find(
+                {"_id": {"$in": list(obj_ids.values())}}, CERTIFICATE_LIST_PROJECTION
+            )
+        }
+
+        originals = {}
+        if status == "verified":
+            match = original_match_query(certs.values())
+            if match:
+                for original in original_data_collection.find(match):
+                    if original.get("public_id"):
+                        originals.setdefault(("public_id", original["public_id"]), original)
+                    if original.get("sha256"):
+                        originals.setdefault(("sha256", original["sha256"]), original)
+
+        updates, changes = [], []
+        # ObjectId -> ids in the request naming it; repeats (e.g. differently
+        # cased hex) share the first one's write and result
+        seen = {}
+        reviewed_at = datetime.utcnow()
+        # Millisecond precision, as Mongo stores it, so the writes can be found again below
+        reviewed_at = reviewed_at.replace(microsecond=reviewed_at.microsecond // 1000 * 1000)
+        for cert_id, cert_obj_id in obj_ids.items():
+            cert = certs.get(str(cert_obj_id))
+            if not cert:
+                results[cert_id] = {"id": cert_id, "error": "Certificate not found"}
+                continue
+            if cert_obj_id in seen:
+                results[cert_id] = {**results[seen[cert_obj_id][0]], "id": cert_id}
+                seen[cert_obj_id].append(cert_id)
+                continue
+            seen[cert_obj_id] = [cert_id]
+
+            original = None
+            if status == "verified":
+                original = (originals.get(("public_id", cert.get("public_id")))
+                            or originals.get(("sha256", cert.get("sha256"))))
+            if status == "rejected":
+                new_status, message = "rejected", "Certificate rejected"
+            elif original:
+                new_status, message = "verified", "Certificate verified successfully"
+            else:
+                new_status, message = "rejected", "FAKE certificate! Rejected"
+
+            # Only applies if nobody changed the status since it was read
+            updates.append(UpdateOne(
+                {"_id": cert_obj_id, "status": cert.get("status")},
+                {"$set": {"status": new_status, "reviewed_at": reviewed_at}}
+            ))
+            changes.append((cert_id, cert_obj_id, (cert.get("user_id"), cert.get("status"), new_status)))
+            # Certificate as it was before this review, like the single endpoint
+            results[cert_id] = {
+                "id": cert_id,
+                "message": message,
+                "certificate": certificate_debug(cert),
+                "original_data_match": original_match_debug(original),
+            }
+
+        if updates:
+            result = certificates_collection.bulk_write(updates, ordered=False)
+            if result.modified_count < len(updates):
+                # Some certificates changed status in between; count only
+                # the transitions whose write landed
+                landed = {doc["_id"] for doc in certificates_collection.find(
+                    {"_id": {"$in": list({c[1] for c in changes})}, "reviewed_at": reviewed_at}, {"_id": 1}
+                )}
+                for _, cert_obj_id, _ in changes:
+                    if cert_obj_id not in landed:
+                        for cert_id in seen[cert_obj_id]:
+                            results[cert_id] = {"id": cert_id, "error": "Certificate changed during review, retry"}
+                changes = [c for c in changes if c[1] in landed]
+            certificate_statuses_changed([change for _, _, change in changes])
+
+        return jsonify({"results": [results[cert_id] for cert_id in dict.fromkeys(ids)]}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+MAX_SIMILARITY_DISTANCE = 16
+
+
+@api.route("/api/admin/certificates/<cert_id>/similar", methods=["GET"])
+@jwt_required()
+def similar_originals(cert_id):
+    """
+    Returns the originals whose perceptual hash is closest to this
+    certificate's, within `distance` bits (default 10).
+    """
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    if not ObjectId.is_valid(cert_id):
+        return jsonify({"error": "Invalid certificate ID"}), 400
+
+    try:
+        distance = min(int(request.args.get("distance", 10)), MAX_SIMILARITY_DISTANCE)
+        limit = min(int(request.args.get("limit", 10)), 100)
+    except ValueError:
+        return jsonify({"error": "distance and limit must be integers"}), 400
+
+    cert = certificates_collection.find_one({"_id": ObjectId(cert_id)}, {"phash": 1})
+    if not cert:
+        return jsonify({"error": "Certificate not found"}), 404
+    if not cert.get("phash"):
+        # Fingerprints are computed by the extraction pipeline after upload
+        return jsonify({"error": "Certificate has no fingerprint (yet)"}), 422
+
+    matches = similarity_index.nearest(cert["phash"], distance, limit)
+    originals = {
+        o["_id"]: o
+        for o in original_data_collection.find(
+            {"_id": {"$in": [original_id for _, original_id in matches]}},
+            {"public_id": 1, "file_name": 1, "title": 1, "phash": 1}
+        )
+    }
+
+    results = []
+    for dist, original_id in matches:
+        original = originals.get(original_id)
+        if original:
+            results.append({**original_match_debug(original), "phash": original.get("phash"), "distance": dist})
+
+    return jsonify({
+        "cert_id": cert_id,
+        "phash": cert["phash"],
+        "max_distance": distance,
+        "index": similarity_index.stats(),
+        "matches": results,
+    }), 200
+
+
+@api.route("/api/admin/stats", methods=["GET"])
+@jwt_required()
+def dashboard_stats():
+    """
+    Certificate totals by status (overall, or for `?user_id=`) plus the
+    most recent hourly or daily upload/review rollups. Served from counters
+    maintained on every write, so cost does not grow with the collection.
+    """
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    granularity = request.args.get("rollup", "day")
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({"error": "rollup must be hour or day"}), 400
+    try:
+        buckets = min(int(request.args.get("buckets", 30)), 24 * 31)
+    except ValueError:
+        return jsonify({"error": "buckets must be an integer"}), 400
+
+    return jsonify({
+        **certificate_stats.summary(request.args.get("user_id")),
+        "rollup": granularity,
+        "buckets": certificate_stats.rollup(granularity, buckets),
+    }), 200
+
+
+@api.route("/api/admin/originals/import", methods=["POST"])
+@jwt_required()
+@limit(("import_user", current_user), concurrency="import")
+def import_original_data():
+    """
+    Upserts an issuing institution's registry of genuine certificates
+    (CSV or .xlsx upload, field "file") into Original_data. Rows are
+    streamed and written in unordered batches; re-importing is idempotent.
+    """
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    file = request.files.get("file")
+    if not file or not file.filename:
+        return jsonify({"error": "Missing file"}), 400
+    if not file.filename.lower().endswith((".csv", ".xlsx", ".xlsm")):
+        return jsonify({"error": "File must be .csv or .xlsx"}), 422
+
+    try:
+        summary = import_rows(
+            iter_sheet(file.stream, file.filename, request.form.get("sheet")),
+            original_data_collection,
+            on_row=lambda doc: original_registry.add(doc.get("public_id"), doc.get("sha256")),
+            progress=False,
+            on_flush=version_markers.bump_originals,
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({"message": "Import complete", **summary}), 200
+
+
+@api.route("/api/admin/extraction/stats", methods=["GET"])
+@jwt_required()
+def extraction_stats():
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    return jsonify(extraction_pipeline.stats()), 200
+
+
+@api.route("/api/admin/rate-limits", methods=["GET"])
+@jwt_required()
+def rate_limit_stats():
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    return jsonify(get_rate_limiter().stats()), 200
+
+
+@api.route("/api/admin/registry/stats", methods=["GET"])
+@jwt_required()
+def original_registry_stats():
+    claims = get_jwt()
+    if claims.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    return jsonify(original_registry.stats()), 200
+
+
+@api.route("/api/admin/users", methods=["GET"])
 @jwt_required()
 def list_users():
     claims = get_jwt()
     if claims.get("role") != "admin":
         return jsonify({"error": "Admin access required"}), 403
 
-    users = list(users_collection.find({}, {"password": 0}))
+    try:
+        limit, after = parse_page_args(request.args)
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
+    users, next_cursor = paginate(users_collection, {}, USER_LIST_PROJECTION, limit, after)
     for u in users:
         u["_id"] = str(u["_id"])
-    return jsonify(users), 200
+    return page_response(users, next_cursor)
 
-@app.route("/api/certificate/<cert_id>/view", methods=["GET"])
+@api.route("/api/certificate/<cert_id>/view", methods=["GET"])
 @jwt_required()
 def view_certificate(cert_id):
     """
-    Returns or redirects to the Cloudinary certificate URL.
+    Streams the file from local storage, or redirects to the Cloudinary URL.
     Only admin or owner of certificate can access.
     """
     user_id = get_jwt_identity()
@@ -298,13 +1188,87 @@ def view_certificate(cert_id):
     if role != "admin" and cert["user_id"] != user_id:
         return jsonify({"error": "Unauthorized"}), 403
 
+    # ?size=thumbnail|preview: the small rendition instead of the original
+    size = request.args.get("size")
+    if size in DERIVATIVE_KINDS:
+        url = cert.get(f"{size}_url")
+        if not url:
+            return jsonify({"error": f"No {size} yet"}), 404
+        response = redirect(url)
+        response.cache_control.private = True
+        response.cache_control.max_age = LOCAL_FILE_MAX_AGE
+        return response
+
+    # Legacy layout: file still embedded as base64 (not yet migrated)
+    if cert.get("file_data"):
+        data = base64.b64decode(cert["file_data"])
+        return send_file(
+            io.BytesIO(data),
+            mimetype=cert.get("file_type") or "application/octet-stream",
+            download_name=cert.get("file_name"),
+            conditional=True,
+            etag=hashlib.sha256(data).hexdigest(),
+        )
+
+    if cert.get("storage") == "local" and storage.serves_locally:
+        return serve_local_file(cert["public_id"], cert.get("content_type"), cert.get("file_name"))
+
     # Option 1: Redirect to Cloudinary URL
     return redirect(cert.get("certificate_url"))
 
     # Option 2 (alternative): Return JSON URL
     # return jsonify({"certificate_url": cert.get("certificate_url")})
 
-@app.route('/api/check_certificate/<cert_id>', methods=['GET'])
+
+LOCAL_FILE_MAX_AGE = 7 * 24 * 3600
+# Derivatives are content-addressed and never rewritten
+DERIVATIVE_MAX_AGE = 365 * 24 * 3600
+
+
+def serve_local_file(key, mimetype=None, download_name=None, max_age=LOCAL_FILE_MAX_AGE):
+    """
+    Sends a content-addressed file with a strong ETag (its SHA-256).
+    Werkzeug answers Range requests with 206 and If-None-Match with 304, and
+    hands the open file to the server's wsgi.file_wrapper so it can use
+    sendfile(); set USE_X_SENDFILE=true to offload to a fronting proxy.
+    """
+    if not storage.stat(key):
+        return jsonify({"error": "File not found"}), 404
+
+    return send_file(
+        storage.path(key),
+        mimetype=mimetype or "application/octet-stream",
+        download_name=download_name,
+        conditional=True,
+        etag=key,
+        max_age=max_age,
+    )
+
+
+@api.route("/api/files/<key>", methods=["GET"])
+def get_stored_file(key):
+    """
+    Serves files from the local storage engine. Keys are SHA-256 digests,
+    so like Cloudinary URLs they are unguessable without the file itself.
+    """
+    if not storage.serves_locally:
+        return jsonify({"error": "Not found"}), 404
+
+    # Thumbnails and previews are most of the traffic here; _id lookup first
+    derivative = derivatives_collection.find_one({"_id": key})
+    if derivative:
+        response = serve_local_file(key, derivative["content_type"], max_age=DERIVATIVE_MAX_AGE)
+        if isinstance(response, tuple):
+            return response
+        response.cache_control.immutable = True
+        return response
+
+    cert = certificates_collection.find_one({"public_id": key}, {"content_type": 1, "file_name": 1})
+    if not cert:
+        return jsonify({"error": "File not found"}), 404
+    return serve_local_file(key, cert.get("content_type"), cert.get("file_name"))
+
+@api.route('/api/check_certificate/<cert_id>', methods=['GET'])
 @jwt_required()
 def check_certificate(cert_id):
     try:
@@ -319,30 +1283,33 @@ def check_certificate(cert_id):
         if not public_id:
             return jsonify({"valid": False, "message": "Image missing"}), 404
 
-        # Check in Cloudinary
-        try:
-            cloudinary.api.resource(public_id)
+        # Check in storage
+        if storage.exists(public_id):
             return jsonify({
                 "valid": True,
                 "message": "Certificate is original",
-                "cloudinary_url": certificate["cloudinary_url"],
+                "cloudinary_url": certificate.get("certificate_url"),
                 "title": certificate["title"],
                 "user_id": certificate["user_id"],
                 "status": certificate["status"]
             }), 200
 
-        except cloudinary.exceptions.NotFound:
-            return jsonify({
-                "valid": False,
-                "message": "FAKE / Image not found in Cloudinary"
-            }), 200
+        return jsonify({
+            "valid": False,
+            "message": "FAKE / Image not found in storage"
+        }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 # 🔍 GET Certificate by ID (Used in Verify.js)
-@app.route("/api/certificates/<cert_id>", methods=["GET"])
+@api.route("/api/certificates/<cert_id>", methods=["GET"])
 @jwt_required()
 def get_certificate_by_id(cert_id):
+    etag = version_markers.etag(CERTIFICATES_SCOPE, "detail", cert_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
     cert = certificates_collection.find_one({"_id": ObjectId(cert_id)})
     if not cert:
         return jsonify({"error": "Certificate not found"}), 404
@@ -354,9 +1321,47 @@ def get_certificate_by_id(cert_id):
     cert["user_id"] = str(cert["user_id"])
     cert["user_name"] = user_name
 
-    return jsonify(cert), 200
+    response = jsonify(cert)
+    response.set_etag(etag)
+    return response, 200
 
 
 # ────────────────────────────────
+def create_app(config=None):
+    """Build a configured Flask app.
+
+    Cheap and side-effect free, so it's safe to call in a gunicorn master
+    with --preload: each worker creates its own Mongo client on first use.
+    """
+    app = Flask(__name__)
+    CORS(app, resources={r"/*": {"origins": "*"}},
+         supports_credentials=True,
+         allow_headers=["Content-Type", "Authorization"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+         expose_headers=["X-Next-Cursor", "ETag", "X-Query-Count", "X-Query-Time-Ms"])
+
+    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "secret123")
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=1)
+    app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "false").lower() in ("1", "true", "yes")
+    if config:
+        app.config.update(config)
+    proxy_hops = int(os.getenv("PROXY_FIX_HOPS", "0"))
+    if proxy_hops:
+        # Behind nginx / a load balancer: take the client IP from X-Forwarded-For,
+        # trusting only this many proxies, so rate limits key on the real client
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
+    JWTManager(app)
+    metrics.init_app(app)
+    query_trace.init_app(app)
+
+    app.register_blueprint(api)
+    return app
+
+
+# `gunicorn app:app` / `flask run` entry point
+app = create_app()
+
 if __name__ == "__main__":
+    # Development server: create indexes and the admin user first
+    db_connection.bootstrap()
     app.run(debug=True)
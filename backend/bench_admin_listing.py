@@ -0,0 +1,111 @@
+"""Round-trip benchmark for the admin certificate listing.
+
+Seeds a throwaway database with synthetic users and certificates, then
+compares the old per-certificate `find_one` owner lookup with the batched
+`$in` lookup used by `GET /api/admin/certificates`.
+
+    python bench_admin_listing.py --users 500 --certs 5000
+"""
+import argparse
+import os
+import time
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
+
+from lookups import attach_user_details
+
+load_dotenv()
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts every command sent to the server"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed(db, n_users, n_certs):
+    db.users.drop()
+    db.certificates.drop()
+
+    user_ids = db.users.insert_many([
+        {"name": f"User {i}", "email": f"user{i}@example.com", "role": "user"}
+        for i in range(n_users)
+    ]).inserted_ids
+
+    certs = []
+    for i in range(n_certs):
+        # Mix stored id formats the way real data does
+        owner = user_ids[i % n_users]
+        certs.append({
+            "user_id": str(owner) if i % 3 else owner,
+            "title": f"Certificate {i}",
+            "file_name": f"cert_{i}.pdf",
+            "status": "pending",
+        })
+    db.certificates.insert_many(certs)
+
+
+def list_before(db):
+    """The listing as it was: one or two `find_one` calls per certificate"""
+    certs = list(db.certificates.find())
+    for cert in certs:
+        try:
+            user = db.users.find_one({"_id": ObjectId(cert["user_id"])})
+        except Exception:
+            user = db.users.find_one({"_id": cert["user_id"]})
+        cert["user_name"] = user["name"] if user else "Unknown"
+        cert["user_email"] = user["email"] if user else "Unknown"
+    return certs
+
+
+def list_after(db):
+    certs = list(db.certificates.find())
+    return attach_user_details(certs, db.users)
+
+
+def measure(label, fn, db, counter):
+    counter.count = 0
+    start = time.perf_counter()
+    certs = fn(db)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {len(certs):>7} certs  {counter.count:>7} round trips  {elapsed * 1000:>9.1f} ms")
+    return counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--certs", type=int, default=2000)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="certificate_system_bench")
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000, event_listeners=[counter])
+    db = client[args.db]
+
+    print(f"Seeding {args.users} users / {args.certs} certificates into '{args.db}'...")
+    seed(db, args.users, args.certs)
+
+    before = measure("before", list_before, db, counter)
+    after = measure("after", list_after, db, counter)
+    print(f"Round trips reduced {before} -> {after}")
+
+    client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""End-to-end load benchmark for the Flask API.
+
+Seeds a throwaway database with synthetic users, certificates and
+originals, stubs out Cloudinary, then drives every main route at a fixed
+concurrency and reports throughput and p50/p95/p99 latency per route as
+JSON, so runs can be diffed between deploys.
+
+By default the app is driven in-process through Flask's test client against
+MongoDB at MONGO_URI (database `certificate_system_bench`, dropped
+afterwards). `--mongomock` swaps in the mongomock in-process stand-in
+instead; `--base-url` drives an already running server over HTTP (that
+server must use the same database and a fake/local storage backend).
+
+    python bench_api.py --users 200 --certs 5000 --requests 500 --concurrency 16 > bench.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+
+ROUTES = ["register", "login", "upload", "list", "admin_list", "verify", "detail"]
+BENCH_PASSWORD = "bench-password"
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# ────────────────────────────────
+# Clients
+# ────────────────────────────────
+class InProcessClient:
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, token=None, json_body=None, form=None, file=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        kwargs = {"headers": headers}
+        if json_body is not None:
+            kwargs["json"] = json_body
+        if form is not None or file is not None:
+            data = dict(form or {})
+            if file:
+                data["file"] = (io.BytesIO(file[1]), file[0])
+            kwargs["data"] = data
+            kwargs["content_type"] = "multipart/form-data"
+        with self.app.test_client() as client:
+            response = client.open(path, method=method, **kwargs)
+            return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, token=None, json_body=None, form=None, file=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        elif form is not None or file is not None:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for name, value in (form or {}).items():
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+            if file:
+                parts.append(
+                    f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file[0]}"\r\n'
+                    f"Content-Type: application/octet-stream\r\n\r\n".encode() + file[1] + b"\r\n"
+                )
+            parts.append(f"--{boundary}--\r\n".encode())
+            body = b"".join(parts)
+            headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                payload = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            payload, status = e.read(), e.code
+        try:
+            return status, json.loads(payload)
+        except ValueError:
+            return status, None
+
+
+# ────────────────────────────────
+# Seeding
+# ────────────────────────────────
+def seed(db, n_users, n_certs, n_originals):
+    import bcrypt
+
+    for name in ("users", "certificates", "Original_data", "versions", "stats", "stats_rollups"):
+        db[name].drop()
+
+    # One low-cost hash shared by every seeded user keeps seeding fast
+    hashed = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(4))
+    users = [
+        {"name": f"Bench User {i}", "email": f"bench{i}@example.com", "password": hashed, "role": "user"}
+        for i in range(n_users)
+    ]
+    users.append({"name": "Bench Admin", "email": "bench-admin@example.com", "password": hashed, "role": "admin"})
+    user_ids = db.users.insert_many(users).inserted_ids
+
+    now = datetime.utcnow()
+    certs = [{
+        "user_id": str(user_ids[i % n_users]),
+        "title": f"Certificate {i}",
+        "file_name": f"cert_{i}.pdf",
+        "public_id": f"academic_certificates/bench_{i}",
+        "certificate_url": f"https://example.invalid/bench_{i}.pdf",
+        "status": "pending",
+        "uploaded_at": now - timedelta(seconds=i),
+    } for i in range(n_certs)]
+    for start in range(0, len(certs), 10000):
+        db.certificates.insert_many(certs[start:start + 10000])
+
+    originals = [{
+        "public_id": f"academic_certificates/bench_{i * 2}",
+        "title": f"Certificate {i * 2}",
+        "file_name": f"cert_{i * 2}.pdf",
+    } for i in range(n_originals)]
+    if originals:
+        db.Original_data.insert_many(originals)
+
+    return [u["email"] for u in users[:-1]], [str(c["_id"]) for c in db.certificates.find({}, {"_id": 1}).limit(5000)]
+
+
+# ────────────────────────────────
+# Scenarios
+# ────────────────────────────────
+def make_scenarios(client, emails, cert_ids, admin_token, user_tokens, upload_bytes):
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    def next_n():
+        with lock:
+            counter["n"] += 1
+            return counter["n"]
+
+    def register():
+        n = next_n()
+        return client.request("POST", "/api/register", json_body={
+            "name": f"New User {n}", "email": f"new-{uuid.uuid4().hex}@example.com", "password": BENCH_PASSWORD,
+        })[0]
+
+    def login():
+        return client.request("POST", "/api/login", json_body={
+            "email": emails[next_n() % len(emails)], "password": BENCH_PASSWORD,
+        })[0]
+
+    def upload():
+        n = next_n()
+        # Unique bytes so every request exercises the full storage path
+        data = uuid.uuid4().bytes + os.urandom(upload_bytes)
+        return client.request(
+            "POST", "/api/certificates", token=user_tokens[n % len(user_tokens)],
+            form={"title": f"Bench upload {n}"}, file=(f"bench_{n}.pdf", data),
+        )[0]
+
+    def list_certs():
+        return client.request("GET", "/api/certificates", token=user_tokens[next_n() % len(user_tokens)])[0]
+
+    def admin_list():
+        return client.request("GET", "/api/admin/certificates?limit=50", token=admin_token)[0]
+
+    def verify():
+        cert_id = cert_ids[next_n() % len(cert_ids)]
+        return client.request(
+            "PUT", f"/api/admin/certificates/{cert_id}/verify", token=admin_token, json_body={"status": "verified"}
+        )[0]
+
+    def detail():
+        cert_id = cert_ids[next_n() % len(cert_ids)]
+        return client.request("GET", f"/api/certificates/{cert_id}", token=admin_token)[0]
+
+    return {
+        "register": register, "login": login, "upload": upload, "list": list_certs,
+        "admin_list": admin_list, "verify": verify, "detail": detail,
+    }
+
+
+def run_route(name, fn, total, concurrency):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    remaining = {"n": total}
+
+    def worker():
+        while True:
+            with lock:
+                if remaining["n"] <= 0:
+                    return
+                remaining["n"] -= 1
+            start = time.perf_counter()
+            try:
+                status = fn()
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    ok = sum(n for status, n in statuses.items() if status.isdigit() and int(status) < 400)
+    return {
+        "route": name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "ok": ok,
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2) if ordered else None,
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2) if ordered else None,
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2) if ordered else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--certs", type=int, default=2000)
+    parser.add_argument("--originals", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--upload-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES)
+    parser.add_argument("--db", default="certificate_system_bench")
+    parser.add_argument("--mongomock", action="store_true", help="use the mongomock in-process stand-in")
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--keep", action="store_true", help="don't drop the bench database afterwards")
+    args = parser.parse_args()
+
+    # Must be in place before the app (and its database module) is imported
+    os.environ["MONGO_DB_NAME"] = args.db
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+    os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="bench_storage_"))
+    os.environ.setdefault("CLOUDINARY_FAKE", "true")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    # Every request comes from 127.0.0.1; the login / register limits would
+    # turn setup and those routes into a 429 benchmark
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    if args.mongomock:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+
+    from pymongo import MongoClient
+    if args.mongomock:
+        import database
+        db = database.get_database().db
+    else:
+        db = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=5000)[args.db]
+
+    print(f"Seeding {args.users} users, {args.certs} certificates, {args.originals} originals...", file=sys.stderr)
+    emails, cert_ids = seed(db, args.users, args.certs, args.originals)
+    # Seeding dropped the collections along with their indexes
+    import database
+    database.db_connection.create_indexes()
+
+    if args.base_url:
+        client = HttpClient(args.base_url)
+    else:
+        from app import create_app
+        client = InProcessClient(create_app())
+
+    def token_for(email):
+        status, body = client.request("POST", "/api/login", json_body={"email": email, "password": BENCH_PASSWORD})
+        if status != 200:
+            raise SystemExit(f"Login failed for {email}: {status} {body}")
+        return body["access_token"]
+
+    admin_token = token_for("bench-admin@example.com")
+    user_tokens = [token_for(email) for email in emails[:min(len(emails), 20)]]
+
+    scenarios = make_scenarios(client, emails, cert_ids, admin_token, user_tokens, args.upload_bytes)
+    results = []
+    for route in args.routes:
+        print(f"Running {route}...", file=sys.stderr)
+        results.append(run_route(route, scenarios[route], args.requests, args.concurrency))
+
+    print(json.dumps({
+        "timestamp": datetime.utcnow().isoformat(),
+        "mode": "http" if args.base_url else "in-process",
+        "database": "mongomock" if args.mongomock else args.db,
+        "seed": {"users": args.users, "certificates": args.certs, "originals": args.originals},
+        "routes": results,
+    }, indent=2))
+
+    if not args.keep and not args.mongomock:
+        db.client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
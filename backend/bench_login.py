@@ -0,0 +1,85 @@
+"""Login throughput benchmark for the bcrypt process pool.
+
+Simulates a burst of logins: `--clients` threads each verify passwords
+through `PasswordHasher` while the pool size and bcrypt cost vary, and
+reports throughput plus p50/p99 latency per combination. `--workers 0`
+runs bcrypt inline on the calling thread, the way login used to.
+
+    python bench_login.py --workers 0 1 2 4 --rounds 10 12 --clients 16
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import bcrypt
+
+from passwords import PasswordHasher
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(workers, rounds, clients, logins):
+    password = "correct horse battery staple"
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds))
+    hasher = PasswordHasher(workers=workers, max_pending=max(clients, 1), rounds=rounds, timeout=120)
+    hasher.check(password, hashed)  # start the pool outside the timed run
+
+    latencies = []
+    lock = threading.Lock()
+    per_client = max(1, logins // clients)
+
+    def client():
+        for _ in range(per_client):
+            start = time.perf_counter()
+            hasher.check(password, hashed)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "workers": workers,
+        "rounds": rounds,
+        "clients": clients,
+        "logins": len(latencies),
+        "logins_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--json", action="store_true", help="one JSON object per line")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{'workers':>7} {'rounds':>6} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for rounds in args.rounds:
+        for workers in args.workers:
+            result = run(workers, rounds, args.clients, args.logins)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{workers:>7} {rounds:>6} {result['logins_per_s']:>9} {result['p50_ms']:>8} {result['p99_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Sync vs cooperative (gevent) serving benchmark.
+
+Seeds a throwaway database, then for each SERVER_MODE starts gunicorn with
+gunicorn.conf.py, drives the chosen routes over HTTP at each concurrency
+level and stops it again. Reports throughput and p50/p95/p99 latency per
+mode, concurrency and route as JSON.
+
+    python bench_serving.py --modes sync gevent --concurrency 10 100 1000 > serving.json
+
+Needs MongoDB at MONGO_URI and gunicorn/gevent installed. 1000 clients need
+a file-descriptor limit above ~2500 (`ulimit -n 4096`).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+from bench_api import HttpClient, make_scenarios, run_route, seed, BENCH_PASSWORD
+
+DEFAULT_ROUTES = ["list", "admin_list", "detail", "login"]
+
+
+def start_server(mode, port, env, workers, threads, connections):
+    env = dict(env, SERVER_MODE=mode, PORT=str(port), WEB_WORKERS=str(workers),
+               WEB_THREADS=str(threads), WEB_CONNECTIONS=str(connections))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as resp:
+                if resp.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f"{mode} server did not become healthy on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=["sync", "gevent"], default=["sync", "gevent"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route and concurrency level")
+    parser.add_argument("--routes", nargs="+", default=DEFAULT_ROUTES)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers in both modes")
+    parser.add_argument("--threads", type=int, default=8, help="threads per sync worker")
+    parser.add_argument("--connections", type=int, default=1000, help="greenlets per gevent worker")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--certs", type=int, default=5000)
+    parser.add_argument("--originals", type=int, default=500)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--db", default="certificate_system_bench")
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+
+    env = dict(os.environ, MONGO_DB_NAME=args.db, STORAGE_BACKEND="local", CLOUDINARY_FAKE="true",
+               BCRYPT_ROUNDS=os.getenv("BCRYPT_ROUNDS", "4"),
+               # All load comes from one IP; measure the routes, not the limiter
+               RATE_LIMIT_ENABLED=os.getenv("RATE_LIMIT_ENABLED", "false"),
+               LOCAL_STORAGE_DIR=tempfile.mkdtemp(prefix="bench_storage_"))
+    db = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=5000)[args.db]
+    print(f"Seeding {args.users} users, {args.certs} certificates...", file=sys.stderr)
+    emails, cert_ids = seed(db, args.users, args.certs, args.originals)
+    # Seeding dropped the collections along with their indexes
+    os.environ["MONGO_DB_NAME"] = args.db
+    from database import db_connection
+    db_connection.create_indexes()
+
+    results = []
+    try:
+        for mode in args.modes:
+            server = start_server(mode, args.port, env, args.workers, args.threads, args.connections)
+            try:
+                client = HttpClient(f"http://127.0.0.1:{args.port}")
+                tokens = {}
+                for email in ["bench-admin@example.com"] + emails[:20]:
+                    status, body = client.request("POST", "/api/login", json_body={"email": email, "password": BENCH_PASSWORD})
+                    if status != 200:
+                        raise SystemExit(f"Login failed for {email}: {status} {body}")
+                    tokens[email] = body["access_token"]
+                admin_token = tokens.pop("bench-admin@example.com")
+                scenarios = make_scenarios(client, emails, cert_ids, admin_token, list(tokens.values()), 0)
+
+                for concurrency in args.concurrency:
+                    for route in args.routes:
+                        print(f"{mode}: {route} x{concurrency}...", file=sys.stderr)
+                        result = run_route(route, scenarios[route], max(args.requests, concurrency), concurrency)
+                        results.append({"mode": mode, **result})
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    finally:
+        db.client.drop_database(args.db)
+
+    print(json.dumps({
+        "timestamp": datetime.utcnow().isoformat(),
+        "workers": args.workers,
+        "threads_per_sync_worker": args.threads,
+        "connections_per_gevent_worker": args.connections,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
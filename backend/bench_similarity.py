@@ -0,0 +1,60 @@
+"""Query-time benchmark for the perceptual-hash similarity index.
+
+Builds multi-index hash tables of random 64-bit hashes at increasing sizes
+and compares a radius-k search against a linear scan. Needs no database.
+
+    python bench_similarity.py --sizes 1000 10000 100000 --distance 4 8
+"""
+import argparse
+import random
+import time
+
+from similarity_index import MultiIndexHash, hamming
+
+
+def linear_search(hashes, value, max_distance):
+    return [(d, i) for i, h in enumerate(hashes) if (d := hamming(value, h)) <= max_distance]
+
+
+def time_queries(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--distance", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'size':>8} {'k':>3} {'build s':>8} {'index ms':>10} {'linear ms':>10} {'speedup':>8}")
+
+    for size in args.sizes:
+        hashes = [rng.getrandbits(64) for _ in range(size)]
+        start = time.perf_counter()
+        index = MultiIndexHash()
+        for i, h in enumerate(hashes):
+            index.add(h, i)
+        build_s = time.perf_counter() - start
+
+        # Queries are near-copies of indexed hashes: a few flipped bits
+        queries = []
+        for _ in range(args.queries):
+            h = rng.choice(hashes)
+            for bit in rng.sample(range(64), 3):
+                h ^= 1 << bit
+            queries.append(h)
+
+        for k in args.distance:
+            index_ms = time_queries(lambda q: index.search(q, k), queries)
+            linear_ms = time_queries(lambda q: linear_search(hashes, q, k), queries)
+            print(f"{size:>8} {k:>3} {build_s:>8.2f} {index_ms:>10.3f} {linear_ms:>10.3f} {linear_ms / index_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Cold-start benchmark: import, app creation and first request.
+
+Each run starts a fresh interpreter that imports `app`, calls
+`create_app()` and serves one request through the test client, timing each
+step. Point `--app-dir` at another checkout (e.g. a `git worktree` of an
+older commit) to compare against it.
+
+    python bench_startup.py --runs 5 [--path /api/health] [--app-dir ../old/backend]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+flask_app = app_module.create_app() if hasattr(app_module, "create_app") else app_module.app
+t2 = time.perf_counter()
+response = flask_app.test_client().get(sys.argv[1])
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2,
+                  "total": t3 - t0, "status": response.status_code}))
+"""
+
+
+def run_once(app_dir, path):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, path],
+        cwd=app_dir, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "probe failed")
+    # The app prints its own startup messages; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/health", help="route for the first request")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    samples = [run_once(args.app_dir, args.path) for _ in range(args.runs)]
+    if args.json:
+        print(json.dumps(samples, indent=2))
+        return
+
+    print(f"{args.app_dir} ({args.runs} runs, first request {args.path} -> {samples[-1]['status']})")
+    for step in ("import", "create_app", "first_request", "total"):
+        values = [s[step] * 1000 for s in samples]
+        print(f"  {step:<14} median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
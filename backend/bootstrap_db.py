@@ -0,0 +1,23 @@
+"""Create database indexes and the default admin user.
+
+    python bootstrap_db.py
+
+Run once per deployment (and after upgrades that add indexes), before or
+alongside starting the API. Safe to re-run: existing indexes and an existing
+admin user are left as they are. The API itself never does this at startup.
+"""
+import sys
+import time
+
+from database import db_connection
+
+
+def main():
+    started = time.perf_counter()
+    if not db_connection.bootstrap():
+        sys.exit(1)
+    print(f"✅ Bootstrap finished in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compute perceptual hashes for originals and certificates that lack one.
+
+    python build_fingerprints.py [--collection originals|certificates] [--limit N]
+
+Files are fetched from their stored URL (`certificate_url`, `url` or
+`secure_url`); originals without a URL borrow it from a certificate with the
+same `public_id`.
+"""
+import argparse
+import urllib.request
+
+from database import collection, get_certificates_collection, get_original_data_collection
+from fingerprint import available, fingerprint_bytes
+from versions import VersionMarkers
+
+URL_FIELDS = ("certificate_url", "url", "secure_url")
+
+
+def file_url(doc, certificates):
+    for field in URL_FIELDS:
+        if doc.get(field):
+            return doc[field]
+    if doc.get("public_id"):
+        cert = certificates.find_one({"public_id": doc["public_id"]}, {"certificate_url": 1})
+        if cert:
+            return cert.get("certificate_url")
+    return None
+
+
+def build(collection, certificates, limit=0):
+    done = skipped = 0
+    cursor = collection.find({"phash": {"$exists": False}}, {"file_data": 0}).batch_size(100)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    for doc in cursor:
+        url = file_url(doc, certificates)
+        if not url:
+            skipped += 1
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=30) as resp:
+                data = resp.read()
+        except Exception as e:
+            print(f"⚠️  {doc['_id']}: download failed: {e}")
+            skipped += 1
+            continue
+
+        phash = fingerprint_bytes(data, doc.get("file_name") or "")
+        if not phash:
+            skipped += 1
+            continue
+        collection.update_one({"_id": doc["_id"]}, {"$set": {"phash": phash}})
+        done += 1
+
+    return done, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", choices=["originals", "certificates"], default="originals")
+    parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    if not available():
+        raise SystemExit("Pillow is required: pip install Pillow (and PyMuPDF for PDFs)")
+
+    certificates = get_certificates_collection()
+    target = get_original_data_collection() if args.collection == "originals" else certificates
+
+    done, skipped = build(target, certificates, args.limit)
+    if done and args.collection == "originals":
+        # Running API processes rebuild their similarity indexes on this
+        VersionMarkers(collection("versions")).bump_originals()
+    print(f"✅ Fingerprinted {done} documents, skipped {skipped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Resumable chunked uploads.
+
+A client opens a session with the total size, PUTs the file in chunks at
+increasing offsets and then completes it. Chunks are appended to a spool
+file on disk and fed to a SHA-256 hasher as they arrive, so neither the
+chunks nor the assembled file are ever held in memory. After a dropped
+connection the client asks for the session's offset and carries on from
+there.
+
+Session state lives in the `upload_sessions` collection; the running
+hasher is kept per process and the digest is recomputed from the spool
+file when a chunk lands on a different worker. Completing claims the
+session atomically, so a retried or duplicated complete can't create a
+second certificate. Sessions expire through a TTL index; `sweep` then
+removes their spool files and hashers.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+
+from file_hash import HASH_CHUNK_SIZE, sha256_of_stream
+from upload_jobs import UPLOAD_SPOOL_DIR
+
+load_dotenv()
+
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_SIZE", str(100 * 1024 * 1024)))
+CHUNKED_UPLOAD_MAX_CHUNK = int(os.getenv("CHUNKED_UPLOAD_MAX_CHUNK", str(8 * 1024 * 1024)))
+CHUNKED_UPLOAD_SWEEP_SECONDS = int(os.getenv("CHUNKED_UPLOAD_SWEEP_SECONDS", "3600"))
+# A complete that takes longer than this is assumed to have died with its process
+COMPLETE_CLAIM_TIMEOUT = timedelta(minutes=10)
+SPOOL_PREFIX = "chunked-"
+
+
+class ChunkedUploadError(Exception):
+    """Rejected chunk or session request; carries the HTTP status to return"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploads:
+    def __init__(self, sessions_collection, spool_dir=UPLOAD_SPOOL_DIR,
+                 max_size=CHUNKED_UPLOAD_MAX_SIZE, max_chunk=CHUNKED_UPLOAD_MAX_CHUNK):
+        self.sessions = sessions_collection
+        self.spool_dir = spool_dir
+        self.max_size = max_size
+        self.max_chunk = max_chunk
+        # session id -> (hasher, bytes hashed)
+        self._hashers = {}
+        self._sweeper = None
+
+    def create(self, user_id, title, file_name, total_size, content_type=None):
+        if not isinstance(total_size, int) or total_size <= 0:
+            raise ChunkedUploadError("total_size must be a positive integer")
+        if total_size > self.max_size:
+            raise ChunkedUploadError(f"File too large. Maximum {self.max_size} bytes allowed.", 413)
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        session = {
+            "user_id": user_id,
+            "title": title,
+            "file_name": file_name,
+            "content_type": content_type,
+            "total_size": total_size,
+            "received": 0,
+            "status": "open",
+            "created_at": datetime.utcnow(),
+        }
+        result = self.sessions.insert_one(session)
+        path = os.path.join(self.spool_dir, f"{SPOOL_PREFIX}{result.inserted_id}")
+        open(path, "wb").close()
+        self.sessions.update_one({"_id": result.inserted_id}, {"$set": {"path": path}})
+
+        session["_id"] = result.inserted_id
+        session["path"] = path
+        self._hashers[result.inserted_id] = (hashlib.sha256(), 0)
+        return session
+
+    def get(self, session_id, user_id):
+        session = self.sessions.find_one({"_id": session_id})
+        if not session:
+            raise ChunkedUploadError("Upload session not found", 404)
+        if session["user_id"] != user_id:
+            raise ChunkedUploadError("Unauthorized", 403)
+        return session
+
+    def write_chunk(self, session_id, user_id, offset, stream, length):
+        """Append one chunk at `offset`; returns the new offset"""
+        session = self.get(session_id, user_id)
+        if session["status"] != "open":
+            raise ChunkedUploadError("Upload session is already completed", 409)
+        if length is None:
+            raise ChunkedUploadError("Content-Length required", 411)
+        if length > self.max_chunk:
+            raise ChunkedUploadError(f"Chunk too large. Maximum {self.max_chunk} bytes allowed.", 413)
+
+        received = session["received"]
+        if offset + length <= received:
+            # Retransmission of a chunk we already have
+            return received
+        if offset != received:
+            raise ChunkedUploadError(f"Expected offset {received}", 409)
+        if offset + length > session["total_size"]:
+            raise ChunkedUploadError("Chunk runs past total_size", 416)
+
+        hasher, hashed = self._hashers.get(session_id, (None, -1))
+        hasher = hasher.copy() if hasher is not None and hashed == offset else None
+
+        written = 0
+        with open(session["path"], "r+b") as out:
+            out.seek(offset)
+            while written < length:
+                piece = stream.read(min(HASH_CHUNK_SIZE, length - written))
+                if not piece:
+                    break
+                out.write(piece)
+                if hasher is not None:
+                    hasher.update(piece)
+                written += len(piece)
+            out.truncate(offset + written)
+
+        if written != length:
+            raise ChunkedUploadError("Chunk body shorter than Content-Length", 400)
+
+        # Only the writer that still sees the expected offset may advance it
+        result = self.sessions.update_one(
+            {"_id": session_id, "received": offset, "status": "open"},
+            {"$set": {"received": offset + written, "updated_at": datetime.utcnow()}}
+        )
+        if not result.modified_count:
+            raise ChunkedUploadError("Concurrent write to upload session", 409)
+
+        if hasher is not None:
+            self._hashers[session_id] = (hasher, offset + written)
+        else:
+            self._hashers.pop(session_id, None)
+        return offset + written
+
+    def finish(self, session_id, user_id):
+        """Claim a fully received session for completion; returns `(session, sha256)`.
+
+        The caller must `close` the session once the certificate exists, or
+        `reopen` it if storing failed.
+        """
+        session = self.get(session_id, user_id)
+        if session["received"] != session["total_size"] and session["status"] == "open":
+            raise ChunkedUploadError(
+                f"Upload incomplete: {session['received']} of {session['total_size']} bytes received", 409
+            )
+
+        now = datetime.utcnow()
+        session = self.sessions.find_one_and_update(
+            {"_id": session_id, "received": session["total_size"],
+             "$or": [{"status": "open"},
+                     {"status": "completing", "completing_at": {"$lt": now - COMPLETE_CLAIM_TIMEOUT}}]},
+            {"$set": {"status": "completing", "completing_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not session:
+            raise ChunkedUploadError("Upload session is already completed or being completed", 409)
+
+        hasher, hashed = self._hashers.pop(session_id, (None, -1))
+        if hasher is not None and hashed == session["total_size"]:
+            digest = hasher.hexdigest()
+        else:
+            try:
+                with open(session["path"], "rb") as f:
+                    digest = sha256_of_stream(f)
+            except OSError:
+                # Spool file is on another host or gone; don't hold the claim
+                self.reopen(session)
+                raise ChunkedUploadError("Upload data is not available on this server", 409)
+        return session, digest
+
+    def reopen(self, session):
+        """Release a claim from `finish` so the client can retry the complete"""
+        self.sessions.update_one(
+            {"_id": session["_id"], "status": "completing"},
+            {"$set": {"status": "open"}, "$unset": {"completing_at": ""}}
+        )
+
+    def sweep(self):
+        """Delete spool files and hashers of sessions that expired or finished; returns files removed"""
+        try:
+            names = os.listdir(self.spool_dir)
+        except FileNotFoundError:
+            names = []
+        paths = {
+            ObjectId(name[len(SPOOL_PREFIX):]): os.path.join(self.spool_dir, name)
+            for name in names
+            if name.startswith(SPOOL_PREFIX) and ObjectId.is_valid(name[len(SPOOL_PREFIX):])
+        }
+
+        ids = list(set(paths) | set(self._hashers))
+        live = set()
+        for start in range(0, len(ids), 1000):
+            live.update(doc["_id"] for doc in self.sessions.find(
+                {"_id": {"$in": ids[start:start + 1000]}, "status": {"$in": ["open", "completing"]}}, {"_id": 1}
+            ))
+
+        removed = 0
+        for session_id, path in paths.items():
+            if session_id not in live:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        for session_id in ids:
+            if session_id not in live:
+                self._hashers.pop(session_id, None)
+        return removed
+
+    def start_sweeper(self, interval=CHUNKED_UPLOAD_SWEEP_SECONDS):
+        """Sweep periodically in a daemon thread of this process"""
+        if self._sweeper or interval <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    removed = self.sweep()
+                    if removed:
+                        print(f"✅ Removed {removed} abandoned chunked upload files")
+                except Exception as e:
+                    print(f"⚠️  Chunked upload sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="chunked-upload-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def close(self, session, certificate_id):
+        self.sessions.update_one(
+            {"_id": session["_id"]},
+            {"$set": {"status": "completed", "certificate_id": certificate_id, "completed_at": datetime.utcnow()}}
+        )
+        try:
+            os.remove(session["path"])
+        except OSError:
+            pass
@@ -1,71 +1,203 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import os
+import threading
 from dotenv import load_dotenv
 import bcrypt
 from datetime import datetime
+from passwords import BCRYPT_ROUNDS
+from db_monitoring import HealthListener, PoolStatsListener
+from search import TEXT_INDEX_NAME, user_search_fields
 
 load_dotenv()
 
+
+def _int_env(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def client_options():
+    """MongoClient pool, timeout and compression settings from the environment"""
+    options = {
+        "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS"),
+        "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+        "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS", 20000),
+        "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS"),
+        "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "heartbeatFrequencyMS": _int_env("MONGO_HEARTBEAT_FREQUENCY_MS", 10000),
+    }
+    # e.g. MONGO_COMPRESSORS=zstd,snappy,zlib (zstd/snappy need their python packages)
+    if os.getenv("MONGO_COMPRESSORS"):
+        options["compressors"] = os.getenv("MONGO_COMPRESSORS")
+    return {k: v for k, v in options.items() if v is not None}
+
+
 class DatabaseConnection:
+    """Lazily created, per-process MongoDB client.
+
+    Nothing connects at import time: the client is built on first use, and
+    rebuilt if the process has forked since (MongoClient is not fork-safe),
+    so the app can be preloaded by gunicorn. Index and admin setup live in
+    `bootstrap()`, run once per deployment by `bootstrap_db.py`.
+    """
+
     def __init__(self):
-        self.client = None
-        self.db = None
-        self.users_collection = None
-        self.certificates_collection = None
-        self.connect()
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.health = HealthListener()
+        self.pool_stats = PoolStatsListener()
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self.connect()
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[os.getenv('MONGO_DB_NAME', 'certificate_system')]
+
+    @property
+    def users_collection(self):
+        return self.db.users
+
+    @property
+    def certificates_collection(self):
+        return self.db.certificates
+
+    @property
+    def original_data_collection(self):
+        return self.db.Original_data
 
     def connect(self):
-        """Establish connection to MongoDB"""
+        """Create this process's client; returns immediately, without a round trip"""
+        # Connection string - using local MongoDB
+        mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/certificate_system')
+
+        if self._pid == os.getpid() and self._client is not None:
+            self._client.close()
+        # A client inherited across fork is left alone; closing it here
+        # would tear down sockets the parent still owns
+        self.health = HealthListener()
+        self.pool_stats = PoolStatsListener()
+
+        # Heartbeats keep `health` current from here on
+        self._client = MongoClient(
+            mongo_uri,
+            event_listeners=[self.health, self.pool_stats],
+            **client_options()
+        )
+        self._pid = os.getpid()
+        return self._client
+
+    def ping(self):
+        """One blocking round trip; True if the server answered"""
         try:
-            # Connection string - using local MongoDB
-            mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/certificate_system')
-            
-            # Create client with timeout
-            self.client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-            
-            # Test connection
-            self.client.admin.command('ismaster')
-            print("✅ MongoDB connected successfully!")
-            
-            # Select database
-            self.db = self.client.certificate_system
-            
-            # Initialize collections
-            self.users_collection = self.db.users
-            self.certificates_collection = self.db.certificates
-            self.original_data_collection = self.db.Original_data
-            
-            # Create indexes for better performance
-            self.create_indexes()
-            
-            # Initialize admin user
-            self.initialize_admin()
-            
+            self.client.admin.command('ping')
+            self.health.mark(True)
             return True
-            
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
+            self.health.mark(False, str(e))
             print(f"❌ MongoDB connection failed: {e}")
             return False
-        except Exception as e:
-            print(f"❌ Unexpected error: {e}")
+
+    def bootstrap(self):
+        """Idempotent one-shot setup: indexes and the default admin user"""
+        if not self.ping():
             return False
+        print("✅ MongoDB connected successfully!")
+        self.create_indexes()
+        self.backfill_user_search_fields()
+        self.initialize_admin()
+        return True
 
     def create_indexes(self):
-        """Create database indexes for better performance"""
-        try:
+        """Create database indexes for better performance.
+
+        Each index is created on its own, so one that fails (e.g. the unique
+        email index over existing duplicates) doesn't stop the rest.
+        """
+        users = self.users_collection
+        certificates = self.certificates_collection
+        originals = self.original_data_collection
+        indexes = [
             # Create unique index on email
-            self.users_collection.create_index("email", unique=True)
-            
+            (users, "email", {"unique": True}),
+
             # Create index on user_id for faster queries
-            self.certificates_collection.create_index("user_id")
-            
+            (certificates, "user_id", {}),
+
             # Create index on status for faster filtering
-            self.certificates_collection.create_index("status")
-            
+            (certificates, "status", {}),
+
+            # Compound indexes backing keyset pagination on (uploaded_at, _id),
+            # alone and combined with the status / user_id list filters
+            (certificates, [("uploaded_at", -1), ("_id", -1)], {}),
+            (certificates, [("status", 1), ("uploaded_at", -1), ("_id", -1)], {}),
+            (certificates, [("user_id", 1), ("uploaded_at", -1), ("_id", -1)], {}),
+            (certificates, [("user_id", 1), ("status", 1), ("uploaded_at", -1), ("_id", -1)], {}),
+
+            # Content hash used to deduplicate uploads
+            (certificates, "sha256", {}),
+            # Storage key, for serving local files (/api/files/<key>)
+            (certificates, "public_id", {"sparse": True}),
+
+            # Admin search: words in titles / file names, and owner prefixes
+            (certificates, [("title", "text"), ("file_name", "text")],
+             {"name": TEXT_INDEX_NAME, "weights": {"title": 3, "file_name": 1}, "default_language": "none"}),
+            (users, "name_search", {}),
+            (users, "email_search", {}),
+
+            # Text extraction queue, and claim lookups by extracted roll number
+            (certificates, "extraction_status", {}),
+            (certificates, "extracted.roll_no", {"sparse": True}),
+
+            # Verification matches uploads against the registry of originals
+            # by public_id or by content hash
+            (originals, "public_id", {}),
+            (originals, "sha256", {"sparse": True}),
+            # Registry rows imported from institution spreadsheets are keyed by roll number
+            (originals, "roll_no", {"sparse": True}),
+
+            # Abandoned chunked upload sessions expire on their own
+            (self.db.upload_sessions, "created_at",
+             {"expireAfterSeconds": int(os.getenv("CHUNKED_UPLOAD_TTL_SECONDS", str(24 * 3600)))}),
+
+            # Dashboard rollups are read newest-first per granularity
+            (self.db.stats_rollups, [("granularity", 1), ("bucket", -1)], {}),
+        ]
+
+        failed = 0
+        for collection, keys, options in indexes:
+            try:
+                collection.create_index(keys, **options)
+            except Exception as e:
+                failed += 1
+                print(f"⚠️  Index creation warning ({collection.name} {keys}): {e}")
+        if failed:
+            print(f"⚠️  {failed} of {len(indexes)} indexes could not be created")
+        else:
             print("✅ Database indexes created successfully!")
+
+    def backfill_user_search_fields(self):
+        """Add `name_search` / `email_search` to users created before search existed"""
+        try:
+            updates = [
+                UpdateOne({"_id": u["_id"]}, {"$set": user_search_fields(u.get("name"), u.get("email"))})
+                for u in self.users_collection.find({"name_search": {"$exists": False}}, {"name": 1, "email": 1})
+            ]
+            for start in range(0, len(updates), 1000):
+                self.users_collection.bulk_write(updates[start:start + 1000], ordered=False)
+            if updates:
+                print(f"✅ Search fields added to {len(updates)} users")
         except Exception as e:
-            print(f"⚠️  Index creation warning: {e}")
+            print(f"⚠️  User search backfill warning: {e}")
 
     def initialize_admin(self):
         """Create default admin user if not exists"""
@@ -75,14 +207,15 @@ class DatabaseConnection:
             
             if not admin_exists:
                 # Hash password for admin123
-                hashed_password = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt())
+                hashed_password = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
                 
                 admin_user = {
                     "name": "System Administrator",
                     "email": admin_email,
                     "password": hashed_password,
                     "role": "admin",
-                    "created_at": datetime.utcnow()
+                    "created_at": datetime.utcnow(),
+                    **user_search_fields("System Administrator", admin_email)
                 }
                 
                 self.users_collection.insert_one(admin_user)
@@ -94,36 +227,76 @@ class DatabaseConnection:
             print(f"❌ Admin initialization failed: {e}")
 
     def check_connection(self):
-        """Check if database connection is alive"""
-        try:
-            if self.client:
-                self.client.admin.command('ismaster')
-                return True
-            return False
-        except:
-            return False
+        """Check if database connection is alive.
+
+        Answers from the driver's last server heartbeat (every
+        MONGO_HEARTBEAT_FREQUENCY_MS) rather than sending a round trip.
+        """
+        if self.health.last_heartbeat is None:
+            # No heartbeat yet in this process (e.g. the first request)
+            return self.ping()
+        return self.health.healthy
+
+    def stats(self):
+        """Health state, pool configuration and pool usage counters"""
+        options = client_options()
+        return {
+            "health": self.health.state(),
+            "pool": {
+                "max_pool_size": options.get("maxPoolSize"),
+                "min_pool_size": options.get("minPoolSize"),
+                "wait_queue_timeout_ms": options.get("waitQueueTimeoutMS"),
+                "compressors": options.get("compressors"),
+                **self.pool_stats.stats(),
+            },
+        }
 
     def close_connection(self):
         """Close database connection"""
-        if self.client:
-            self.client.close()
+        if self._client and self._pid == os.getpid():
+            self._client.close()
+            self._client = None
             print("✅ Database connection closed")
 
+class LazyCollection:
+    """Stand-in for a collection, resolved against the current process's client.
+
+    Safe to keep in a module global: nothing connects until it's used and a
+    forked worker transparently gets its own client.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(db_connection.db[self.name], attr)
+
+    def __getitem__(self, name):
+        return LazyCollection(f"{self.name}.{name}")
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
+
+
 # Global database instance
 db_connection = DatabaseConnection()
 
+def collection(name):
+    """Lazily resolved collection by name"""
+    return LazyCollection(name)
+
 def get_database():
     """Get database instance"""
     return db_connection
 
 def get_users_collection():
     """Get users collection"""
-    return db_connection.users_collection
+    return LazyCollection("users")
 
 def get_certificates_collection():
     """Get certificates collection"""
-    return db_connection.certificates_collection
+    return LazyCollection("certificates")
 
 def get_original_data_collection():
     """Get original data collection"""
-    return db_connection.original_data_collection
\ No newline at end of file
+    return LazyCollection("Original_data")
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""pymongo monitoring listeners for connection health and pool usage.
+
+`HealthListener` follows the driver's own server heartbeats, so checking
+whether Mongo is up is a memory read instead of an `ismaster` round trip.
+`PoolStatsListener` records how many connections are checked out, how long
+threads wait to get one and how often that wait times out, which is what
+worker and pool sizes should be tuned against.
+"""
+import threading
+import time
+from datetime import datetime
+
+from pymongo import monitoring
+
+
+class HealthListener(monitoring.ServerHeartbeatListener):
+    def __init__(self):
+        self.healthy = False
+        self.last_heartbeat = None
+        self.last_error = None
+        self.last_rtt_ms = None
+
+    def mark(self, healthy, error=None):
+        self.healthy = healthy
+        self.last_heartbeat = datetime.utcnow()
+        self.last_error = error
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.last_rtt_ms = round(event.duration * 1000, 2)
+        self.mark(True)
+
+    def failed(self, event):
+        self.mark(False, str(event.reply))
+
+    def state(self):
+        return {
+            "healthy": self.healthy,
+            "last_heartbeat": self.last_heartbeat.isoformat() if self.last_heartbeat else None,
+            "last_rtt_ms": self.last_rtt_ms,
+            "last_error": self.last_error,
+        }
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_queue_timeouts = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def _wait_time(self):
+        # Check-out start and finish are reported on the requesting thread
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self._wait_time()
+        with self._lock:
+            self.checkout_failures += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.wait_queue_timeouts += 1
+            self.total_wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+
+    def connection_checked_out(self, event):
+        waited = self._wait_time()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.total_wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self):
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_queue_timeouts": self.wait_queue_timeouts,
+                "avg_wait_ms": round(self.total_wait_s / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_s * 1000, 3),
+            }
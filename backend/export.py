@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from lookups import attach_user_details
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FIELDS = [
+    "_id", "user_id", "user_name", "user_email", "title", "file_name",
+    "status", "uploaded_at", "certificate_url", "public_id",
+]
+
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS if field not in ("user_name", "user_email")}
+
+
+def _export_row(cert):
+    row = {}
+    for field in EXPORT_FIELDS:
+        value = cert.get(field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        row[field] = value
+    return row
+
+
+def iter_batches(cursor, users_collection, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of export rows, joining owners once per batch"""
+    batch = []
+    for cert in cursor:
+        batch.append(cert)
+        if len(batch) >= batch_size:
+            yield [_export_row(c) for c in attach_user_details(batch, users_collection)]
+            batch = []
+    if batch:
+        yield [_export_row(c) for c in attach_user_details(batch, users_collection)]
+
+
+def ndjson_chunks(batches):
+    for rows in batches:
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header-only export when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
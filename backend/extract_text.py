@@ -0,0 +1,68 @@
+"""Run the text extraction pipeline outside the API.
+
+    python extract_text.py [--backfill] [--follow] [--workers N] [--batch-size N]
+
+`--backfill` first queues every certificate that has never been through
+extraction, or went through an older version of it (e.g. before
+thumbnails and previews were added). Then batches run until
+the queue is empty, or forever with `--follow` - the usual way to run
+extraction, as one dedicated worker (EXTRACTION_ENABLED is off on the API
+by default). Certificates extracted without Pillow or PyMuPDF are queued
+again by `--backfill` once they're installed.
+"""
+import argparse
+import time
+
+from database import collection, get_certificates_collection
+from extraction import EXTRACTION_VERSION
+from extraction_pipeline import EXTRACTION_BATCH_SIZE, EXTRACTION_WORKERS, ExtractionPipeline
+from storage import get_storage
+from versions import VersionMarkers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backfill", action="store_true", help="queue certificates not extracted by this version")
+    parser.add_argument("--follow", action="store_true", help="keep polling for new uploads")
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=EXTRACTION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    certificates = get_certificates_collection()
+    if args.backfill:
+        result = certificates.update_many(
+            {"public_id": {"$exists": True},
+             "extraction_status": {"$nin": ["pending", "extracting"]},
+             "extraction_version": {"$ne": EXTRACTION_VERSION}},
+            {"$set": {"extraction_status": "pending"}}
+        )
+        print(f"↪️  Queued {result.modified_count} existing certificates")
+
+    pipeline = ExtractionPipeline(
+        certificates, collection("extractions"), get_storage(), collection("derivatives"),
+        workers=args.workers, batch_size=args.batch_size,
+    )
+    # Lists and details now carry new fields; invalidate their ETags
+    pipeline.on_certificates_change = VersionMarkers(collection("versions")).bump_certificates
+    if args.follow:
+        pipeline.run_forever()
+        return
+
+    pipeline.requeue_stale()
+    started = time.perf_counter()
+    total = 0
+    while True:
+        claimed = pipeline.run_batch()
+        if not claimed:
+            break
+        total += claimed
+        elapsed = time.perf_counter() - started
+        print(f"  {total} certificates ({total / elapsed:.1f}/s), "
+              f"{pipeline.extracted} parsed, {pipeline.cache_hits} from cache, {pipeline.failed} failed")
+
+    print(f"✅ Processed {total} certificates in {time.perf_counter() - started:.1f}s: "
+          f"{pipeline.extracted} parsed, {pipeline.cache_hits} from cache, {pipeline.failed} failed")
+
+
+if __name__ == "__main__":
+    main()
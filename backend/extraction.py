@@ -0,0 +1,226 @@
+"""Text and metadata extraction from certificate files.
+
+PDFs with a text layer are read with PyMuPDF; images contribute their EXIF
+metadata via Pillow. Both libraries are optional - without them a file just
+yields no text. From the text, `extract_fields` pulls the claims a
+certificate makes (holder name, course, issue date, roll number) in the
+normalized form they are compared in.
+
+Everything here is pure and picklable so it can run in worker processes;
+the queueing and caching around it live in extraction_pipeline.py. The
+perceptual hash (fingerprint.py) is computed in the same pass, so rendering
+never happens on the upload request.
+"""
+import io
+import re
+from datetime import datetime
+
+from fingerprint import fingerprint_bytes
+from thumbnails import render_derivatives
+
+try:
+    from PIL import Image, ExifTags
+except ImportError:
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Bump when extraction or field parsing changes so cached results are redone
+# (2: thumbnails and previews, 3: perceptual hash)
+EXTRACTION_VERSION = 3
+MAX_EXTRACTION_BYTES = 32 * 1024 * 1024
+MAX_PDF_PAGES = 3
+MAX_TEXT_CHARS = 20000
+
+EXIF_FIELDS = ("DateTimeOriginal", "DateTime", "Make", "Model", "Software", "ImageDescription", "Artist")
+
+NAME_RE = re.compile(
+    r"(?:certify\s+that|awarded\s+to|presented\s+to|conferred\s+(?:up)?on|granted\s+to)\s+"
+    r"(?:(?:mr|ms|mrs|miss|dr)\.?\s+)?([A-Za-z][A-Za-z.'\- ]{1,80}?)"
+    r"(?=\s*(?:,|\n|\bhas\b|\bwho\b|\bfor\b|\bof\b|\bs/o\b|\bd/o\b|$))",
+    re.IGNORECASE,
+)
+COURSE_RE = re.compile(
+    r"(?:successfully\s+completed|completion\s+of|degree\s+of|course\s+(?:in|on)|"
+    r"programme\s+in|program\s+in|diploma\s+in)\s+(?:the\s+)?([A-Za-z0-9&().'\- ]{2,120}?)"
+    r"(?=\s*(?:\n|,|\.|\bcourse\b|\bprogramme\b|\bprogram\b|\bwith\b|\bon\b|\bfrom\b|\bheld\b|\bduring\b|$))",
+    re.IGNORECASE,
+)
+ROLL_NO_RE = re.compile(
+    r"\b(?:roll|reg(?:istration)?|enrol(?:l)?ment)\s*(?:no\.?|number|#)?\s*[:\-]?\s*([A-Z0-9][A-Z0-9\-/]{2,29})\b",
+    re.IGNORECASE,
+)
+MONTHS = "jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec"
+DATE_RES = [
+    (re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"), ("%Y-%m-%d",)),
+    (re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b"), ("%d/%m/%Y",)),
+    (re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+((?:{MONTHS})[a-z]*),?\s+(\d{{4}})\b", re.IGNORECASE), ("%d %B %Y", "%d %b %Y")),
+    (re.compile(rf"\b((?:{MONTHS})[a-z]*)\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.IGNORECASE), ("%B %d %Y", "%b %d %Y")),
+]
+ISSUE_DATE_HINT_RE = re.compile(r"(?:date\s+of\s+issue|issued\s+on|issue\s+date|dated|date)\s*[:\-]?\s*", re.IGNORECASE)
+
+
+def normalize_text(value):
+    """Lower-cased, whitespace-collapsed form used for claim comparison"""
+    return " ".join(str(value or "").split()).lower() or None
+
+
+def parse_date(text):
+    """First date in `text` as a datetime, or None"""
+    best = None
+    for pattern, formats in DATE_RES:
+        match = pattern.search(text)
+        if not match or (best and match.start() >= best[0]):
+            continue
+        raw = re.sub(r"(?i)\bsept\b", "sep", " ".join(match.groups()))
+        for fmt in formats:
+            try:
+                best = (match.start(), datetime.strptime(raw, fmt.replace("/", " ").replace("-", " ")))
+                break
+            except ValueError:
+                continue
+    return best[1] if best else None
+
+
+def extract_fields(text, metadata=None):
+    """Normalized claims found in a certificate's text"""
+    fields = {}
+    if text:
+        flat = " ".join(text.split())
+        match = NAME_RE.search(text) or NAME_RE.search(flat)
+        if match:
+            fields["name"] = normalize_text(match.group(1))
+        match = COURSE_RE.search(text) or COURSE_RE.search(flat)
+        if match:
+            fields["course"] = normalize_text(match.group(1))
+        match = ROLL_NO_RE.search(flat)
+        if match:
+            fields["roll_no"] = match.group(1)
+
+        hint = ISSUE_DATE_HINT_RE.search(flat)
+        issue_date = parse_date(flat[hint.end():hint.end() + 40]) if hint else None
+        issue_date = issue_date or parse_date(flat)
+        if issue_date:
+            fields["issue_date"] = issue_date
+
+    if "issue_date" not in fields and metadata:
+        # Photos of paper certificates: fall back to when the picture was taken
+        taken = metadata.get("DateTimeOriginal") or metadata.get("DateTime")
+        try:
+            fields["capture_date"] = datetime.strptime(str(taken), "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            pass
+    return fields
+
+
+def missing_dependencies(is_pdf):
+    """Optional libraries this file needs but this process lacks"""
+    missing = [] if Image is not None else ["Pillow"]
+    if is_pdf and fitz is None:
+        missing.append("PyMuPDF")
+    return missing
+
+
+def extract_pdf(data):
+    if fitz is None:
+        return {"kind": "pdf", "error": "PyMuPDF not installed"}
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        text = "\n".join(doc[i].get_text() for i in range(min(doc.page_count, MAX_PDF_PAGES)))
+        metadata = {k: v for k, v in (doc.metadata or {}).items() if v}
+        return {
+            "kind": "pdf",
+            "pages": doc.page_count,
+            "has_text_layer": bool(text.strip()),
+            "text": text[:MAX_TEXT_CHARS],
+            "metadata": metadata,
+        }
+
+
+def extract_image(data):
+    if Image is None:
+        return {"kind": "image", "error": "Pillow not installed"}
+    with Image.open(io.BytesIO(data)) as image:
+        metadata = {}
+        exif = image.getexif()
+        if exif:
+            # DateTimeOriginal and friends live in the Exif sub-IFD
+            tags = dict(exif)
+            tags.update(exif.get_ifd(0x8769))
+            for tag, value in tags.items():
+                name = ExifTags.TAGS.get(tag)
+                if name in EXIF_FIELDS:
+                    metadata[name] = str(value).strip("\x00 ")
+        return {
+            "kind": "image",
+            "format": image.format,
+            "width": image.width,
+            "height": image.height,
+            "metadata": metadata,
+        }
+
+
+def extract(data, file_name="", derivatives=False):
+    """Extraction result for one file; never raises.
+
+    With `derivatives`, also renders the thumbnail and preview images,
+    returned as bytes under "derivatives" for the caller to store.
+    """
+    if len(data) > MAX_EXTRACTION_BYTES:
+        return {"kind": "unknown", "error": "File too large"}
+    is_pdf = data[:5] == b"%PDF-" or file_name.lower().endswith(".pdf")
+    try:
+        result = extract_pdf(data) if is_pdf else extract_image(data)
+    except Exception as e:
+        return {"kind": "unknown", "error": str(e)}
+    # Partial results for lack of a library aren't final; see extraction_pipeline
+    result["missing_dependencies"] = missing_dependencies(is_pdf)
+    result["fields"] = extract_fields(result.get("text"), result.get("metadata"))
+    result["phash"] = fingerprint_bytes(data, file_name)
+    result["version"] = EXTRACTION_VERSION
+    if derivatives:
+        try:
+            result["derivatives"] = render_derivatives(data, file_name)
+        except Exception as e:
+            result["derivatives"] = {}
+            result["derivatives_error"] = str(e)
+    return result
+
+
+# Original_data columns (snake_case, as import_originals stores them) per claim
+CLAIM_COLUMNS = {
+    "name": ("name", "student_name", "candidate_name", "holder_name"),
+    "course": ("course", "course_name", "program", "programme", "degree"),
+    "issue_date": ("issue_date", "date_of_issue", "issued_on"),
+    "roll_no": ("roll_no",),
+}
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    parsed = parse_date(str(value))
+    return parsed.date() if parsed else None
+
+
+def compare_claims(extracted, original):
+    """Per-claim agreement between extracted fields and an Original_data row.
+
+    Claims missing on either side are left out rather than counted as a
+    mismatch; `matched` is None when nothing could be compared.
+    """
+    fields = {}
+    for field, columns in CLAIM_COLUMNS.items():
+        claimed = (extracted or {}).get(field)
+        recorded = next((original[c] for c in columns if original.get(c) not in (None, "")), None)
+        if claimed is None or recorded is None:
+            continue
+        if field == "issue_date":
+            fields[field] = _as_date(claimed) == _as_date(recorded)
+        elif field == "roll_no":
+            fields[field] = str(claimed).strip().upper() == str(recorded).strip().upper()
+        else:
+            fields[field] = normalize_text(claimed) == normalize_text(recorded)
+    return {"fields": fields, "matched": all(fields.values()) if fields else None}
@@ -0,0 +1,277 @@
+"""Background text extraction for uploaded certificates.
+
+New certificates are stored with `extraction_status: "pending"`. A
+dispatcher thread claims them in batches (atomically, so any number of
+API processes or `extract_text.py` workers can share the queue), and
+fetches each distinct file from storage once. The files are parsed in a
+process pool, so parsing never holds the API's GIL. Results are cached in
+the `extractions` collection under the file's SHA-256: re-uploads and
+duplicates are answered from the cache without being parsed again.
+
+Each certificate gets the normalized claims as `extracted` (name, course,
+issue_date, roll_no), its perceptual hash as `phash`, and
+`extraction_status` done / failed / skipped, so verification compares
+indexed fields instead of parsing on demand.
+
+The same pass renders the thumbnail and first-page preview (thumbnails.py)
+and stores them content-addressed beside the original, recorded in the
+`derivatives` collection; the certificate gets `thumbnail_url` and
+`preview_url`. Engines with URL transformations (Cloudinary) skip the
+rendering and get transformation URLs instead.
+
+Extraction normally runs as one dedicated worker (`extract_text.py
+--follow`), next to the API rather than inside every API process. Parsing
+uses a process pool, or gevent's native thread pool when gevent has
+patched this process (as in passwords.py). Results that are incomplete
+because Pillow or PyMuPDF is missing are neither cached nor stamped with
+the extraction version, so `extract_text.py --backfill` redoes them once
+the library is installed.
+
+Files are downloaded from their stored `certificate_url` when it is an
+absolute URL, not through `storage.open`: for Cloudinary that would cost an
+Admin API call (which is rate limited) per certificate.
+
+    EXTRACTION_ENABLED=true       also run the dispatcher inside API processes
+    EXTRACTION_WORKERS=1          parser processes per dispatcher
+    EXTRACTION_BATCH_SIZE=16      certificates claimed per round
+    EXTRACTION_POLL_SECONDS=5     idle wait between rounds when nothing is queued
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument, UpdateOne
+
+from extraction import EXTRACTION_VERSION, MAX_EXTRACTION_BYTES, extract
+from passwords import gevent_patched
+from thumbnails import DERIVATIVE_KINDS
+
+load_dotenv()
+
+EXTRACTION_ENABLED = os.getenv("EXTRACTION_ENABLED", "false").lower() in ("1", "true", "yes")
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "1"))
+EXTRACTION_BATCH_SIZE = int(os.getenv("EXTRACTION_BATCH_SIZE", "16"))
+EXTRACTION_POLL_SECONDS = float(os.getenv("EXTRACTION_POLL_SECONDS", "5"))
+# Claims older than this are assumed to belong to a crashed worker
+EXTRACTION_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+CLAIM_PROJECTION = {"public_id": 1, "sha256": 1, "file_name": 1, "user_id": 1, "certificate_url": 1}
+DERIVATIVE_FOLDER = "academic_certificates/derivatives"
+DERIVATIVE_EXTENSIONS = {"image/webp": "webp", "image/jpeg": "jpg", "image/png": "png"}
+
+
+class ExtractionPipeline:
+    def __init__(self, certificates_collection, cache_collection, storage, derivatives_collection,
+                 workers=EXTRACTION_WORKERS, batch_size=EXTRACTION_BATCH_SIZE,
+                 poll_seconds=EXTRACTION_POLL_SECONDS):
+        self.certificates = certificates_collection
+        self.cache = cache_collection
+        self.storage = storage
+        self.derivatives = derivatives_collection
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.extracted = 0
+        self.cache_hits = 0
+        self.failed = 0
+        # Called with the owners' user ids after certificates are updated
+        self.on_certificates_change = None
+
+    def _get_pool(self):
+        # Same rules as the password pool: one per process, spawned children,
+        # gevent's native threads when gevent has patched the process
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                if gevent_patched():
+                    from gevent.threadpool import ThreadPoolExecutor
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def notify(self):
+        """Wake the dispatcher after queueing new work"""
+        self._wake.set()
+
+    def start(self):
+        """Run the dispatcher in a daemon thread of this process"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run_forever, name="text-extraction", daemon=True)
+        self._thread.start()
+
+    def run_forever(self):
+        """Dispatch batches until the process exits"""
+        self.requeue_stale()
+        while True:
+            try:
+                claimed = self.run_batch()
+            except Exception as e:
+                print(f"⚠️  Text extraction batch failed: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def requeue_stale(self):
+        """Return claims abandoned by a crashed worker to the queue"""
+        self.certificates.update_many(
+            {"extraction_status": "extracting",
+             "extraction_claimed_at": {"$lt": datetime.utcnow() - EXTRACTION_CLAIM_TIMEOUT}},
+            {"$set": {"extraction_status": "pending"}}
+        )
+
+    def claim(self, limit):
+        claimed = []
+        for _ in range(limit):
+            cert = self.certificates.find_one_and_update(
+                # Async uploads are queued too but have no stored file yet
+                {"extraction_status": "pending", "status": {"$ne": "uploading"}},
+                {"$set": {"extraction_status": "extracting", "extraction_claimed_at": datetime.utcnow()}},
+                projection=CLAIM_PROJECTION,
+                return_document=ReturnDocument.AFTER,
+            )
+            if not cert:
+                break
+            claimed.append(cert)
+        return claimed
+
+    def _read(self, cert):
+        url = cert.get("certificate_url") or ""
+        if url.startswith(("http://", "https://")):
+            source = urllib.request.urlopen(url, timeout=30)
+        else:
+            # Local storage serves relative /api/files URLs; read the file directly
+            source = self.storage.open(cert["public_id"])
+        with source as f:
+            return f.read(MAX_EXTRACTION_BYTES + 1)
+
+    def _store_derivatives(self, source_sha256, rendered):
+        """Store rendered (bytes, content_type) pairs; returns {kind: {key, url, content_type}}"""
+        stored = {}
+        for kind, (data, content_type) in rendered.items():
+            digest = hashlib.sha256(data).hexdigest()
+            result = self.storage.put(
+                io.BytesIO(data), f"{kind}.{DERIVATIVE_EXTENSIONS[content_type]}", digest, folder=DERIVATIVE_FOLDER
+            )
+            self.derivatives.update_one(
+                {"_id": result["key"]},
+                {"$set": {"kind": kind, "content_type": content_type, "source_sha256": source_sha256,
+                          "size": len(data), "created_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            stored[kind] = {"key": result["key"], "url": result["url"], "content_type": content_type}
+        return stored
+
+    def _derivative_fields(self, cert, result):
+        if self.storage.transforms:
+            if result.get("kind") not in ("pdf", "image"):
+                return {}
+            urls = {kind: self.storage.derivative_url(cert["public_id"], kind) for kind in DERIVATIVE_KINDS}
+        else:
+            urls = {kind: d["url"] for kind, d in (result.get("derivatives") or {}).items()}
+        return {f"{kind}_url": url for kind, url in urls.items() if url}
+
+    def run_batch(self):
+        """Claim, extract and store one batch; returns how many were claimed"""
+        claimed = self.claim(self.batch_size)
+        if not claimed:
+            return 0
+
+        hashes = {c["sha256"] for c in claimed if c.get("sha256")}
+        results = {
+            doc["_id"]: doc for doc in self.cache.find(
+                {"_id": {"$in": list(hashes)}, "version": EXTRACTION_VERSION}, {"text": 0}
+            )
+        } if hashes else {}
+        self.cache_hits += sum(1 for c in claimed if c.get("sha256") in results)
+
+        # One parse per distinct file still missing from the cache
+        futures = {}
+        for cert in claimed:
+            sha256 = cert.get("sha256")
+            if not sha256 or not cert.get("public_id") or sha256 in results or sha256 in futures:
+                continue
+            try:
+                data = self._read(cert)
+            except Exception as e:
+                print(f"⚠️  Text extraction could not read {cert['_id']}: {e}")
+                continue
+            futures[sha256] = self._get_pool().submit(
+                extract, data, cert.get("file_name") or "", not self.storage.transforms
+            )
+
+        cache_updates = []
+        for sha256, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"kind": "unknown", "error": str(e), "fields": {}, "version": EXTRACTION_VERSION}
+            result["extracted_at"] = datetime.utcnow()
+            if result.get("derivatives"):
+                try:
+                    result["derivatives"] = self._store_derivatives(sha256, result["derivatives"])
+                except Exception as e:
+                    print(f"⚠️  Storing derivatives of {sha256} failed: {e}")
+                    result["derivatives"] = {}
+            results[sha256] = result
+            self.extracted += 1
+            if result.get("missing_dependencies"):
+                # Redone once the library is installed; don't pin this result
+                continue
+            cache_updates.append(UpdateOne({"_id": sha256}, {"$set": result}, upsert=True))
+        if cache_updates:
+            self.cache.bulk_write(cache_updates, ordered=False)
+
+        now = datetime.utcnow()
+        updates = []
+        for cert in claimed:
+            result = results.get(cert.get("sha256"))
+            if not cert.get("sha256"):
+                change = {"extraction_status": "skipped"}
+            elif result is None or result.get("error"):
+                change = {"extraction_status": "failed",
+                          "extraction_error": result.get("error") if result else "File unavailable"}
+                self.failed += 1
+            else:
+                change = {"extraction_status": "done", "extracted": result.get("fields", {}),
+                          "extracted_kind": result.get("kind"), **self._derivative_fields(cert, result)}
+                if result.get("phash"):
+                    change["phash"] = result["phash"]
+                if not result.get("missing_dependencies"):
+                    change["extraction_version"] = EXTRACTION_VERSION
+            change["extraction_finished_at"] = now
+            updates.append(UpdateOne(
+                {"_id": cert["_id"], "extraction_status": "extracting"},
+                {"$set": change, "$unset": {"extraction_claimed_at": ""}}
+            ))
+        self.certificates.bulk_write(updates, ordered=False)
+        if self.on_certificates_change:
+            self.on_certificates_change([c.get("user_id") for c in claimed])
+        return len(claimed)
+
+    def stats(self):
+        return {
+            "enabled": EXTRACTION_ENABLED,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "extracted": self.extracted,
+            "cache_hits": self.cache_hits,
+            "failed": self.failed,
+            "queued": self.certificates.count_documents({"extraction_status": "pending"}),
+        }
@@ -0,0 +1,19 @@
+import hashlib
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def sha256_of_stream(stream, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 hex digest of a file-like object, read in fixed-size chunks.
+
+    The stream is rewound afterwards so it can be handed on to storage.
+    """
+    digest = hashlib.sha256()
+    stream.seek(0)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
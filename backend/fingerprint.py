@@ -0,0 +1,70 @@
+"""Perceptual fingerprints of certificate files.
+
+A dHash of the rendered first page survives re-encoding, scanning and small
+edits, unlike the SHA-256 content hash. Images are decoded with Pillow and
+PDFs rendered with PyMuPDF; both are optional, and files that cannot be
+rendered simply have no fingerprint.
+"""
+import io
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+HASH_SIZE = 8
+PDF_RENDER_DPI = 72
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """64-bit difference hash as a 16-char hex string"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def render_first_page(data, file_name="", dpi=PDF_RENDER_DPI):
+    """Decode an image or render page one of a PDF; None if unsupported"""
+    if Image is None:
+        return None
+
+    if data[:5] == b"%PDF-" or file_name.lower().endswith(".pdf"):
+        if fitz is None:
+            return None
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            if doc.page_count == 0:
+                return None
+            pix = doc[0].get_pixmap(dpi=dpi)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+    except Exception:
+        return None
+
+
+def available():
+    return Image is not None
+
+
+def fingerprint_bytes(data, file_name=""):
+    """Perceptual hash of a certificate file, or None"""
+    try:
+        image = render_first_page(data, file_name)
+        return dhash(image) if image is not None else None
+    except Exception as e:
+        print(f"⚠️  Fingerprint failed for {file_name}: {e}")
+        return None
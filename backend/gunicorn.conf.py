@@ -0,0 +1,50 @@
+"""gunicorn settings for the API.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+SERVER_MODE picks the worker model:
+
+* `sync` (default) - threaded workers (gthread). Each worker serves at most
+  WEB_THREADS requests at once, so throughput is capped by
+  WEB_WORKERS x WEB_THREADS while requests wait on Mongo and storage.
+* `gevent` - cooperative workers. The same routes run as greenlets over
+  non-blocking sockets (pymongo, Cloudinary's urllib3 and the upload pool
+  all yield while waiting on I/O), up to WEB_CONNECTIONS per worker. CPU
+  heavy steps - bcrypt, file hashing, fingerprinting - still take their
+  turn on the loop, bcrypt on gevent's native thread pool.
+
+Both modes serve the same Flask app, so JWT and CORS behave identically.
+"""
+import multiprocessing
+import os
+
+SERVER_MODE = os.getenv("SERVER_MODE", "sync").lower()
+
+if SERVER_MODE == "gevent":
+    # Patch before the app (and pymongo) is imported by the preloading master
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_WORKERS", str(multiprocessing.cpu_count())))
+# Importing the app is side-effect free, so preloading is safe (see create_app)
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+if SERVER_MODE == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("WEB_CONNECTIONS", "1000"))
+elif SERVER_MODE == "sync":
+    worker_class = "gthread"
+    threads = int(os.getenv("WEB_THREADS", "8"))
+else:
+    raise ValueError(f"Unknown SERVER_MODE: {SERVER_MODE}")
+
+
+def child_exit(server, worker):
+    # Drop a dead worker's live gauges from the shared /metrics files
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
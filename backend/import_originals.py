@@ -0,0 +1,183 @@
+"""Bulk import of genuine certificates into the `Original_data` registry.
+
+Reads CSV or Excel (.xlsx) sheets row by row - openpyxl in read-only mode
+for Excel, the csv module otherwise - so memory stays flat however large the
+sheet is. Each row is normalized and upserted on its identifying key in
+unordered batches, which makes re-running the same file a no-op.
+
+Headers are normalized to snake_case ("RollNo" -> "roll_no"). A row is
+keyed by the first of `public_id`, `sha256` or `roll_no` it has; rows with
+none of them are reported as invalid.
+
+    python import_originals.py registry.xlsx [--batch-size 1000] [--sheet NAME]
+
+openpyxl (in requirements.txt) is only needed for .xlsx input.
+"""
+import argparse
+import csv
+import io
+import re
+import time
+from datetime import date, datetime
+
+from pymongo import UpdateOne
+
+KEY_FIELDS = ("public_id", "sha256", "roll_no")
+IDENTIFIER_FIELDS = {"public_id", "sha256", "roll_no"}
+DEFAULT_BATCH_SIZE = 1000
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def normalize_header(header):
+    header = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", str(header or "").strip())
+    return re.sub(r"[^0-9a-z]+", "_", header.lower()).strip("_")
+
+
+def normalize_value(field, value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if field in IDENTIFIER_FIELDS or isinstance(value, str):
+        value = " ".join(str(value).split())
+        if field == "sha256":
+            value = value.lower()
+        return value or None
+    return value
+
+
+def iter_csv(stream):
+    reader = csv.reader(stream)
+    headers = next(reader, None)
+    if headers is None:
+        return
+    yield headers
+    yield from reader
+
+
+def iter_xlsx(path_or_stream, sheet=None):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("openpyxl is required for .xlsx imports: pip install openpyxl")
+
+    workbook = load_workbook(path_or_stream, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_sheet(path_or_stream, file_name, sheet=None):
+    """Yield the header row and then every data row of a CSV or .xlsx file"""
+    if file_name.lower().endswith((".xlsx", ".xlsm")):
+        yield from iter_xlsx(path_or_stream, sheet)
+    elif isinstance(path_or_stream, str):
+        with open(path_or_stream, newline="", encoding="utf-8-sig") as f:
+            yield from iter_csv(f)
+    else:
+        yield from iter_csv(io.TextIOWrapper(path_or_stream, encoding="utf-8-sig", newline=""))
+
+
+def normalize_row(headers, values):
+    """Row as a document, or None when it has no identifying key"""
+    doc = {}
+    for field, value in zip(headers, values):
+        if field:
+            value = normalize_value(field, value)
+            if value is not None:
+                doc[field] = value
+
+    if "sha256" in doc and not SHA256_RE.match(doc["sha256"]):
+        del doc["sha256"]
+    if not any(doc.get(key) for key in KEY_FIELDS):
+        return None
+    return doc
+
+
+def import_rows(rows, original_data_collection, batch_size=DEFAULT_BATCH_SIZE, on_row=None, progress=True,
+                on_flush=None):
+    """Upsert normalized rows; returns a summary dict.
+
+    `on_row` is called with every valid document, e.g. to feed the
+    in-process original registry; `on_flush` after every written batch,
+    e.g. to bump the originals version marker for other processes.
+    """
+    rows = iter(rows)
+    headers = [normalize_header(h) for h in next(rows, [])]
+    summary = {"rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "invalid": 0}
+    started = time.perf_counter()
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        result = original_data_collection.bulk_write(batch, ordered=False)
+        summary["inserted"] += result.upserted_count
+        summary["updated"] += result.modified_count
+        summary["unchanged"] += result.matched_count - result.modified_count
+        batch.clear()
+        if on_flush:
+            on_flush()
+        if progress:
+            elapsed = time.perf_counter() - started
+            print(f"  {summary['rows']} rows ({summary['rows'] / elapsed:.0f} rows/s)")
+
+    now = datetime.utcnow()
+    for values in rows:
+        if not values or all(v is None or v == "" for v in values):
+            continue
+        summary["rows"] += 1
+        doc = normalize_row(headers, values)
+        if doc is None:
+            summary["invalid"] += 1
+            continue
+
+        key = next(k for k in KEY_FIELDS if doc.get(k))
+        batch.append(UpdateOne(
+            {key: doc[key]},
+            {"$set": doc, "$setOnInsert": {"imported_at": now}},
+            upsert=True,
+        ))
+        if on_row:
+            on_row(doc)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    elapsed = time.perf_counter() - started
+    summary["seconds"] = round(elapsed, 2)
+    summary["rows_per_second"] = round(summary["rows"] / elapsed, 1) if elapsed else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="CSV or .xlsx file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--sheet", help="worksheet name (Excel only; default: active sheet)")
+    args = parser.parse_args()
+
+    from database import collection, get_original_data_collection
+    from versions import VersionMarkers
+
+    # Running API processes reload their original registries on this marker
+    markers = VersionMarkers(collection("versions"))
+    summary = import_rows(
+        iter_sheet(args.path, args.path, args.sheet),
+        get_original_data_collection(),
+        args.batch_size,
+        on_flush=markers.bump_originals,
+    )
+    print(f"✅ Imported {summary['rows']} rows in {summary['seconds']}s "
+          f"({summary['rows_per_second']} rows/s): {summary['inserted']} inserted, "
+          f"{summary['updated']} updated, {summary['unchanged']} unchanged, {summary['invalid']} invalid")
+
+
+if __name__ == "__main__":
+    main()
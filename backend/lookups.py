@@ -0,0 +1,43 @@
+from bson import ObjectId
+
+
+def _user_id_candidates(raw_ids):
+    """Return the `_id` values to query for a set of stored user ids.
+
+    Certificates store `user_id` as the JWT identity string, but older
+    documents may hold an ObjectId or a string that is not a valid ObjectId,
+    so both forms are included.
+    """
+    candidates = set()
+    for raw in raw_ids:
+        if raw is None:
+            continue
+        candidates.add(raw)
+        if isinstance(raw, str) and ObjectId.is_valid(raw):
+            candidates.add(ObjectId(raw))
+    return list(candidates)
+
+
+def fetch_users_by_ids(users_collection, raw_ids, projection=None):
+    """Fetch all referenced users in one `$in` query, keyed by string id"""
+    candidates = _user_id_candidates(raw_ids)
+    if not candidates:
+        return {}
+
+    if projection is None:
+        projection = {"name": 1, "email": 1}
+
+    users = users_collection.find({"_id": {"$in": candidates}}, projection)
+    return {str(u["_id"]): u for u in users}
+
+
+def attach_user_details(certs, users_collection):
+    """Add `user_name` / `user_email` to every certificate in one round trip"""
+    users = fetch_users_by_ids(users_collection, {c.get("user_id") for c in certs})
+
+    for cert in certs:
+        user = users.get(str(cert.get("user_id")))
+        cert["user_name"] = user["name"] if user else "Unknown"
+        cert["user_email"] = user["email"] if user else "Unknown"
+
+    return certs
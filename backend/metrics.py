@@ -0,0 +1,149 @@
+"""Prometheus metrics: route latency, Mongo command timings, storage timings.
+
+* `http_request_duration_seconds` / `http_requests_total` - per route
+  template (`/api/certificates/<cert_id>`, not the raw path) and status.
+* `mongo_command_duration_seconds` - every command the driver sends, by
+  collection and command name, timed by a pymongo `CommandListener`.
+* `storage_operation_duration_seconds` - put/open/exists/delete/stat on the
+  configured storage engine (Cloudinary calls included).
+
+Recording is a dict lookup and a histogram observe per event, cheap enough
+to leave on permanently. Exposed at GET /metrics. With several gunicorn
+workers set PROMETHEUS_MULTIPROC_DIR to an empty directory so the endpoint
+aggregates every worker (see gunicorn.conf.py). METRICS_ENABLED=false turns
+it all off.
+"""
+import functools
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from pymongo import monitoring
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+)
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by status", ["method", "route", "status"],
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ["collection", "command"],
+    buckets=FAST_BUCKETS,
+)
+MONGO_FAILURES = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ["collection", "command"],
+)
+STORAGE_LATENCY = Histogram(
+    "storage_operation_duration_seconds", "Storage engine call latency", ["backend", "operation"],
+)
+STORAGE_FAILURES = Counter(
+    "storage_operation_failures_total", "Failed storage engine calls", ["backend", "operation"],
+)
+SHED_REQUESTS = Counter(
+    "http_requests_shed_total", "Requests refused by rate limits or concurrency caps", ["route", "reason"],
+)
+
+STORAGE_OPERATIONS = ("put", "open", "exists", "delete", "stat")
+
+
+def command_collection(event):
+    """Collection a command targets ("" for admin commands such as ping)"""
+    if event.command_name == "getMore":
+        return event.command.get("collection", "")
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else ""
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        # request_id -> collection; succeeded/failed events don't carry the command
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self._collections[event.request_id] = command_collection(event)
+
+    def _finish(self, event):
+        with self._lock:
+            return self._collections.pop(event.request_id, "")
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(self._finish(event), event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+
+def instrument_storage(storage):
+    """Time every storage call on `storage`; returns the same object"""
+    if not METRICS_ENABLED or getattr(storage, "_instrumented", False):
+        return storage
+
+    def timed(operation, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                STORAGE_FAILURES.labels(storage.name, operation).inc()
+                raise
+            finally:
+                STORAGE_LATENCY.labels(storage.name, operation).observe(time.perf_counter() - started)
+        return wrapper
+
+    for operation in STORAGE_OPERATIONS:
+        setattr(storage, operation, timed(operation, getattr(storage, operation)))
+    storage._instrumented = True
+    return storage
+
+
+_listener_registered = False
+
+
+def init_app(app):
+    """Record every request on `app` and serve GET /metrics"""
+    global _listener_registered
+    if not METRICS_ENABLED:
+        return
+    if not _listener_registered:
+        # Applies to every MongoClient created afterwards (the app's is lazy)
+        monitoring.register(MongoCommandMetrics())
+        _listener_registered = True
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        return response
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+
+
+def metrics_view():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
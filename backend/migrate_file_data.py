@@ -0,0 +1,151 @@
+"""Move legacy base64 `file_data` blobs out of the certificates collection.
+
+The old API (uploads/app1.py) stored whole files as base64 strings inside
+certificate documents. This streams them, a batch at a time, into the
+configured storage engine and replaces each blob with a storage reference
+(`public_id`, `certificate_url`, `storage`, `sha256`).
+
+Progress is checkpointed in the `migrations` collection after every batch,
+so an interrupted run picks up where it stopped. Documents that failed are
+kept in the checkpoint's `failed_ids` and retried at the start of every run. Read endpoints serve both
+layouts, so the API can stay up while this runs.
+
+    python migrate_file_data.py [--batch-size 50] [--limit N] [--dry-run]
+"""
+import argparse
+import base64
+import hashlib
+import io
+import time
+from datetime import datetime
+
+from database import get_certificates_collection, get_database
+from storage import get_storage
+from versions import VersionMarkers
+
+MIGRATION_ID = "file_data_to_storage"
+
+
+def load_checkpoint(migrations):
+    checkpoint = migrations.find_one({"_id": MIGRATION_ID}) or {
+        "_id": MIGRATION_ID, "last_id": None, "migrated": 0, "failed": 0, "bytes_reclaimed": 0,
+    }
+    checkpoint.setdefault("failed_ids", [])
+    return checkpoint
+
+
+def save_checkpoint(migrations, checkpoint):
+    checkpoint["updated_at"] = datetime.utcnow()
+    migrations.replace_one({"_id": MIGRATION_ID}, checkpoint, upsert=True)
+
+
+def migrate_one(certificates, storage, cert, dry_run=False):
+    """Store one blob and swap it for a reference; returns bytes reclaimed"""
+    blob = cert["file_data"]
+    data = base64.b64decode(blob)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    if dry_run:
+        return len(blob)
+
+    stored = storage.put(io.BytesIO(data), cert.get("file_name"), sha256)
+    result = certificates.update_one(
+        # Only swap if the blob is still there (another run may have won)
+        {"_id": cert["_id"], "file_data": {"$exists": True}},
+        {
+            "$set": {
+                "public_id": stored["key"],
+                "certificate_url": stored["url"],
+                "storage": storage.name,
+                "sha256": sha256,
+                "content_type": cert.get("file_type"),
+                "file_size": len(data),
+                "file_data_migrated_at": datetime.utcnow(),
+            },
+            "$unset": {"file_data": ""},
+        },
+    )
+    return len(blob) if result.modified_count else 0
+
+
+def run(batch_size=50, limit=0, dry_run=False):
+    certificates = get_certificates_collection()
+    migrations = get_database().db.migrations
+    storage = get_storage()
+    version_markers = VersionMarkers(get_database().db.versions)
+
+    checkpoint = load_checkpoint(migrations)
+    if checkpoint["last_id"]:
+        print(f"↪️  Resuming after {checkpoint['last_id']} "
+              f"({checkpoint['migrated']} migrated, {checkpoint['bytes_reclaimed'] / 1e6:.1f} MB reclaimed so far)")
+
+    started = time.perf_counter()
+    run_docs = run_bytes = 0
+    projection = {"file_data": 1, "file_name": 1, "file_type": 1, "user_id": 1}
+    # Earlier failures first; they sit behind the checkpoint and would never be seen again
+    retry_ids = list(checkpoint["failed_ids"])
+
+    while True:
+        size = batch_size if not limit else min(batch_size, limit - run_docs)
+        if size <= 0:
+            break
+        if retry_ids:
+            batch_ids, retry_ids = retry_ids[:size], retry_ids[size:]
+            batch = list(certificates.find({"_id": {"$in": batch_ids}, "file_data": {"$exists": True}}, projection))
+            # Already migrated (or deleted) since they failed
+            gone = set(batch_ids) - {cert["_id"] for cert in batch}
+            checkpoint["failed_ids"] = [i for i in checkpoint["failed_ids"] if i not in gone]
+            if not batch:
+                continue
+        else:
+            query = {"file_data": {"$exists": True}}
+            if checkpoint["last_id"]:
+                query["_id"] = {"$gt": checkpoint["last_id"]}
+            batch = list(certificates.find(query, projection).sort("_id", 1).limit(size))
+            if not batch:
+                break
+
+        for cert in batch:
+            retrying = cert["_id"] in checkpoint["failed_ids"]
+            try:
+                reclaimed = migrate_one(certificates, storage, cert, dry_run)
+                checkpoint["migrated"] += 1
+                checkpoint["bytes_reclaimed"] += reclaimed
+                run_bytes += reclaimed
+                if retrying:
+                    checkpoint["failed_ids"].remove(cert["_id"])
+            except Exception as e:
+                print(f"❌ {cert['_id']}: {e}")
+                if not retrying:
+                    checkpoint["failed_ids"].append(cert["_id"])
+            checkpoint["failed"] = len(checkpoint["failed_ids"])
+            if not retrying:
+                checkpoint["last_id"] = cert["_id"]
+            run_docs += 1
+
+        if not dry_run:
+            save_checkpoint(migrations, checkpoint)
+            # Migrated documents now carry new URLs; invalidate cached lists
+            version_markers.bump_certificates([cert.get("user_id") for cert in batch])
+
+        elapsed = time.perf_counter() - started
+        print(f"  {run_docs} docs, {run_bytes / 1e6:.1f} MB reclaimed "
+              f"({run_docs / elapsed:.1f} docs/s, {run_bytes / 1e6 / elapsed:.2f} MB/s)")
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {'Dry run: ' if dry_run else ''}{run_docs} documents in {elapsed:.1f}s; "
+          f"{run_bytes / 1e6:.1f} MB reclaimed this run, "
+          f"{checkpoint['bytes_reclaimed'] / 1e6:.1f} MB total, {checkpoint['failed']} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=0, help="stop after N documents")
+    parser.add_argument("--dry-run", action="store_true", help="measure without writing")
+    args = parser.parse_args()
+    run(args.batch_size, args.limit, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
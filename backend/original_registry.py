@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from versions import ORIGINALS_SCOPE
+
+load_dotenv()
+
+
+def _hash_key(sha256):
+    # Keep content hashes apart from public_ids in the shared set
+    return f"sha256:{sha256}"
+
+
+class OriginalRegistry:
+    """In-process set of every `public_id` and `sha256` in `Original_data`.
+
+    Verification asks `might_contain` before querying Mongo: an unknown
+    `public_id` (a fake certificate) is answered from memory, a known one
+    still goes to Mongo for the full document. Until the set has been loaded
+    every lookup falls through to Mongo, so a disabled or cold registry never
+    changes verification results.
+
+    Every writer to `Original_data` (the admin import, `import_originals.py`,
+    `build_fingerprints.py`) bumps the "originals" version marker; each
+    process polls it and reloads as soon as it moves, so rows written by
+    another worker or a CLI run are not reported missing for long.
+    """
+
+    def __init__(self, enabled=True, refresh_seconds=0, poll_seconds=0):
+        self.enabled = enabled
+        self.refresh_seconds = refresh_seconds
+        self.poll_seconds = poll_seconds
+        self.version = None
+        self._ids = None
+        self._recent = set()
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._refresh_thread = None
+        self.loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _marker(self, markers):
+        if markers is None:
+            return None
+        try:
+            return markers.get(ORIGINALS_SCOPE)
+        except Exception as e:
+            print(f"⚠️  Original registry version check failed: {e}")
+            return None
+
+    def load(self, collection, markers=None):
+        """(Re)build the set from `Original_data`"""
+        if not self.enabled:
+            return
+        # Read before scanning: a write during the scan bumps past it and
+        # triggers another reload
+        version = self._marker(markers)
+        with self._lock:
+            self._reloading = True
+            self._recent = set()
+        try:
+            ids = set()
+            projection = {"public_id": 1, "sha256": 1, "_id": 0}
+            for doc in collection.find({}, projection).batch_size(10000):
+                if doc.get("public_id"):
+                    ids.add(doc["public_id"])
+                if doc.get("sha256"):
+                    ids.add(_hash_key(doc["sha256"]))
+        except Exception as e:
+            print(f"⚠️  Original registry load failed: {e}")
+            with self._lock:
+                self._reloading = False
+            return
+        with self._lock:
+            # Keep anything added while the reload was scanning
+            ids |= self._recent
+            self._ids = ids
+            self._recent = set()
+            self._reloading = False
+            self.loaded_at = datetime.utcnow()
+            self.version = version
+        print(f"✅ Original registry loaded: {len(ids)} keys")
+
+    def start(self, collection, markers=None):
+        """Load now and keep reloading in the background.
+
+        Reloads when the "originals" marker in `markers` changes (checked
+        every `poll_seconds`) and unconditionally every `refresh_seconds`.
+        """
+        self.load(collection, markers)
+        intervals = [self.refresh_seconds]
+        if markers is not None:
+            intervals.append(self.poll_seconds)
+        intervals = [i for i in intervals if i > 0]
+        if not self.enabled or not intervals or self._refresh_thread:
+            return
+
+        def refresh():
+            last_load = time.monotonic()
+            while True:
+                time.sleep(min(intervals))
+                due = self.refresh_seconds > 0 and time.monotonic() - last_load >= self.refresh_seconds
+                if not due and markers is not None:
+                    version = self._marker(markers)
+                    due = version is not None and version != self.version
+                if due:
+                    self.load(collection, markers)
+                    last_load = time.monotonic()
+
+        self._refresh_thread = threading.Thread(target=refresh, name="original-registry-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def add(self, public_id=None, sha256=None):
+        """Record an original inserted into `Original_data`"""
+        keys = [k for k in (public_id, sha256 and _hash_key(sha256)) if k]
+        with self._lock:
+            for key in keys:
+                if self._ids is not None:
+                    self._ids.add(key)
+                if self._reloading:
+                    self._recent.add(key)
+
+    def discard(self, public_id=None, sha256=None):
+        """Record an original removed from `Original_data`"""
+        keys = [k for k in (public_id, sha256 and _hash_key(sha256)) if k]
+        with self._lock:
+            for key in keys:
+                if self._ids is not None:
+                    self._ids.discard(key)
+                self._recent.discard(key)
+
+    def _contains(self, key):
+        ids = self._ids
+        if ids is None:
+            self.bypassed += 1
+            return True
+        if key in ids:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def might_contain(self, public_id):
+        """False only when `public_id` is definitely not an original"""
+        return self._contains(public_id)
+
+    def might_contain_hash(self, sha256):
+        """False only when no original has this content hash"""
+        return self._contains(_hash_key(sha256))
+
+    def stats(self):
+        ids = self._ids
+        return {
+            "enabled": self.enabled,
+            "loaded": ids is not None,
+            "size": len(ids) if ids is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "refresh_seconds": self.refresh_seconds,
+            "poll_seconds": self.poll_seconds,
+            "version": self.version,
+        }
+
+
+registry = OriginalRegistry(
+    enabled=os.getenv("ORIGINAL_REGISTRY_CACHE", "false").lower() in ("1", "true", "yes"),
+    refresh_seconds=int(os.getenv("ORIGINAL_REGISTRY_REFRESH_SECONDS", "300")),
+    poll_seconds=float(os.getenv("ORIGINAL_REGISTRY_POLL_SECONDS", "5")),
+)
+
+
+def get_original_registry():
+    """Get the process-wide original registry"""
+    return registry
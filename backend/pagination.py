@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+
+class InvalidPageRequest(ValueError):
+    """Raised when `limit` or `after` query parameters are malformed"""
+
+
+def encode_cursor(doc, sort_field=None):
+    """Build an opaque cursor pointing just past `doc`"""
+    payload = {"id": str(doc["_id"])}
+    if sort_field:
+        value = doc.get(sort_field)
+        payload["v"] = value.isoformat() if isinstance(value, datetime) else None
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort_field=None):
+    """Return `(sort_value, ObjectId)` for a cursor made by `encode_cursor`"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = ObjectId(payload["id"])
+        value = payload.get("v")
+        if sort_field and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, last_id
+    except Exception:
+        raise InvalidPageRequest("Invalid cursor")
+
+
+def parse_page_args(args, sort_field=None):
+    """Read `limit` and `after` from request args"""
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_LIMIT))
+    except (TypeError, ValueError):
+        raise InvalidPageRequest("limit must be an integer")
+    if limit < 1:
+        raise InvalidPageRequest("limit must be positive")
+    limit = min(limit, MAX_PAGE_LIMIT)
+
+    after = args.get("after")
+    return limit, decode_cursor(after, sort_field) if after else None
+
+
+def _after_clause(after, sort_field):
+    """Keyset condition for a descending `(sort_field, _id)` ordering"""
+    value, last_id = after
+    if not sort_field:
+        return {"_id": {"$lt": last_id}}
+
+    if value is None:
+        # Documents without the sort field sort last; only `_id` moves on
+        return {sort_field: None, "_id": {"$lt": last_id}}
+
+    return {"$or": [
+        {sort_field: {"$lt": value}},
+        {sort_field: value, "_id": {"$lt": last_id}},
+        {sort_field: None},
+    ]}
+
+
+def paginate(collection, query, projection, limit, after=None, sort_field=None):
+    """Fetch one page in `(sort_field, _id)` descending order.
+
+    Returns `(docs, next_cursor)`; `next_cursor` is None on the last page.
+    Only `limit + 1` documents are ever read, so memory per request does not
+    depend on the collection size.
+    """
+    if after:
+        query = {"$and": [query, _after_clause(after, sort_field)]} if query else _after_clause(after, sort_field)
+
+    sort = [(sort_field, -1), ("_id", -1)] if sort_field else [("_id", -1)]
+    docs = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
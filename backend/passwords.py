@@ -0,0 +1,129 @@
+"""Password hashing off the request thread.
+
+bcrypt is deliberately slow and holds the GIL while it runs, so hashing on
+the request thread stalls every other request the worker is serving. Here
+it runs in a bounded process pool instead; the cost factor comes from
+config and older, cheaper hashes are upgraded on the next successful login.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+# bcrypt only looks at the first 72 bytes; longer input is rejected outright
+MAX_PASSWORD_BYTES = 72
+
+
+class PasswordTooLong(ValueError):
+    pass
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Hashing unavailable (queue full, timed out, pool died); the caller should shed the request"""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def gevent_patched():
+    """True when gevent has monkey-patched threading in this process"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+class PasswordHasher:
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 rounds=BCRYPT_ROUNDS, timeout=PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Pools don't survive fork; each worker process builds its own, and
+        # spawns its children so they don't inherit the Mongo client
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                if gevent_patched():
+                    # Under gevent the process pool's helper threads would be
+                    # greenlets; hash on gevent's native OS threads instead so
+                    # a hash never runs on the event loop
+                    from gevent.threadpool import ThreadPoolExecutor
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Password hashing queue is full")
+        try:
+            return self._get_pool().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordHasherBusy(f"Password hashing took longer than {self.timeout}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); build a fresh pool next time
+            with self._lock:
+                self._pool = None
+            raise PasswordHasherBusy("Password hashing pool restarted")
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def encode(password):
+        encoded = password.encode("utf-8")
+        if len(encoded) > MAX_PASSWORD_BYTES:
+            raise PasswordTooLong(f"Password must be at most {MAX_PASSWORD_BYTES} bytes")
+        return encoded
+
+    def hash(self, password):
+        return self._run(_hash, self.encode(password), self.rounds)
+
+    def check(self, password, hashed):
+        if isinstance(hashed, str):
+            hashed = hashed.encode("utf-8")
+        return self._run(_check, self.encode(password), hashed)
+
+    def needs_rehash(self, hashed):
+        """True when a stored hash uses a lower cost than configured"""
+        if isinstance(hashed, bytes):
+            hashed = hashed.decode("utf-8", "replace")
+        try:
+            return int(hashed.split("$")[2]) < self.rounds
+        except (IndexError, ValueError):
+            return False
+
+
+password_hasher = PasswordHasher()
+
+
+def get_password_hasher():
+    """Get the process-wide password hasher"""
+    return password_hasher
@@ -0,0 +1,272 @@
+"""Request-scoped MongoDB query tracing.
+
+Records every command a request sends - collection, command, duration and
+documents returned or written - and builds a per-request summary. Explain
+is optional: the read and write commands are re-run afterwards with
+`explain` (queryPlanner verbosity, nothing executes). Their winning plans
+flag collection scans (COLLSCAN) and in-memory sorts (SORT stage).
+
+    QUERY_TRACE=off|sample|all      which requests are traced (default off)
+    QUERY_TRACE_SAMPLE_RATE=0.01    share of requests traced in `sample` mode
+    QUERY_TRACE_EXPLAIN=true        capture winning plans for traced requests
+    QUERY_TRACE_SLOW_MS=100         log summaries slower than this
+    QUERY_TRACE_KEEP=200            recent summaries kept for the admin endpoint
+
+Flagged or slow requests are logged. The most recent summaries are also
+served at GET /api/admin/query-traces. Tests can trace directly:
+
+    with trace_queries() as trace:
+        client.get("/api/certificates", headers=auth)
+    assert trace.count <= 3 and not trace.collscans
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from flask import g, request
+from pymongo import monitoring
+
+load_dotenv()
+
+QUERY_TRACE = os.getenv("QUERY_TRACE", "off").lower()
+QUERY_TRACE_SAMPLE_RATE = float(os.getenv("QUERY_TRACE_SAMPLE_RATE", "0.01"))
+QUERY_TRACE_EXPLAIN = os.getenv("QUERY_TRACE_EXPLAIN", "true").lower() in ("1", "true", "yes")
+QUERY_TRACE_SLOW_MS = float(os.getenv("QUERY_TRACE_SLOW_MS", "100"))
+QUERY_TRACE_KEEP = int(os.getenv("QUERY_TRACE_KEEP", "200"))
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Driver-added fields the server rejects inside an explain
+SESSION_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "readConcern", "writeConcern"}
+
+_current = ContextVar("query_trace", default=None)
+recent_traces = deque(maxlen=QUERY_TRACE_KEEP)
+
+
+def _docs_count(command_name, reply):
+    """Documents returned (reads) or affected (writes) according to the reply"""
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    return reply.get("n")
+
+
+def _plan_stages(plan):
+    """Every stage name in a winning plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for key in ("inputStage", "queryPlan", "thenStage", "elseStage"):
+            yield from _plan_stages(plan.get(key))
+        yield from _plan_stages(plan.get("inputStages"))
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def _winning_plans(explain):
+    """Winning plans anywhere in explain output (aggregate nests them per stage)"""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from _winning_plans(item)
+
+
+class QueryTrace:
+    def __init__(self, label=None, explain=QUERY_TRACE_EXPLAIN):
+        self.label = label
+        self.explain = explain
+        self.commands = []
+        self._pending = {}
+        self.started = time.perf_counter()
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+    @property
+    def total_ms(self):
+        return round(sum(c["duration_ms"] for c in self.commands), 3)
+
+    @property
+    def collscans(self):
+        return [c for c in self.commands if "COLLSCAN" in c.get("plan", ())]
+
+    @property
+    def in_memory_sorts(self):
+        return [c for c in self.commands if "SORT" in c.get("plan", ())]
+
+    def explain_commands(self, client):
+        """Attach winning-plan stage names to every explainable command"""
+        token = _current.set(None)  # the explains themselves aren't traced
+        try:
+            for record in self.commands:
+                command = record.pop("_command", None)
+                if command is None:
+                    continue
+                try:
+                    explain = client[record["database"]].command(
+                        {"explain": command, "verbosity": "queryPlanner"}
+                    )
+                    record["plan"] = sorted({s for p in _winning_plans(explain) for s in _plan_stages(p)})
+                except Exception as e:
+                    record["plan_error"] = str(e)
+        finally:
+            _current.reset(token)
+
+    def summary(self):
+        by_operation = {}
+        for c in self.commands:
+            key = f"{c['collection']}.{c['command']}" if c["collection"] else c["command"]
+            entry = by_operation.setdefault(key, {"count": 0, "duration_ms": 0.0})
+            entry["count"] += 1
+            entry["duration_ms"] = round(entry["duration_ms"] + c["duration_ms"], 3)
+        return {
+            "label": self.label,
+            "queries": self.count,
+            "query_time_ms": self.total_ms,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "collscans": [f"{c['collection']}.{c['command']}" for c in self.collscans],
+            "in_memory_sorts": [f"{c['collection']}.{c['command']}" for c in self.in_memory_sorts],
+            "by_operation": by_operation,
+            "commands": [{k: v for k, v in c.items() if not k.startswith("_")} for c in self.commands],
+        }
+
+
+class QueryTraceListener(monitoring.CommandListener):
+    """Appends each command to the trace active on the issuing thread/greenlet"""
+
+    def started(self, event):
+        trace = _current.get()
+        if trace is None:
+            return
+        command = None
+        if trace.explain and event.command_name in EXPLAINABLE_COMMANDS:
+            command = {k: v for k, v in event.command.items() if k not in SESSION_FIELDS}
+        trace._pending[event.request_id] = (event, command)
+
+    def _finish(self, event, reply=None, failure=None):
+        trace = _current.get()
+        if trace is None:
+            return
+        started, command = trace._pending.pop(event.request_id, (None, None))
+        if started is None:
+            return
+        if event.command_name == "getMore":
+            collection = started.command.get("collection", "")
+        else:
+            target = started.command.get(event.command_name)
+            collection = target if isinstance(target, str) else ""
+        record = {
+            "command": event.command_name,
+            "collection": collection,
+            "database": event.database_name,
+            "duration_ms": round(event.duration_micros / 1000, 3),
+            "docs": _docs_count(event.command_name, reply) if reply else None,
+        }
+        if failure:
+            record["error"] = str(failure.get("errmsg", failure))
+        if command is not None:
+            record["_command"] = command
+        trace.commands.append(record)
+
+    def succeeded(self, event):
+        self._finish(event, reply=event.reply)
+
+    def failed(self, event):
+        self._finish(event, failure=event.failure)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def install_listener():
+    """Register the listener (once); must happen before the client is created"""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueryTraceListener()
+            monitoring.register(_listener)
+
+
+@contextmanager
+def trace_queries(label=None, explain=True):
+    """Trace every Mongo command issued inside the block"""
+    from database import db_connection
+
+    install_listener()
+    trace = QueryTrace(label, explain)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        if explain:
+            trace.explain_commands(db_connection.client)
+
+
+def _should_trace():
+    if QUERY_TRACE == "all":
+        return True
+    return QUERY_TRACE == "sample" and random.random() < QUERY_TRACE_SAMPLE_RATE
+
+
+def init_app(app):
+    """Trace requests on `app` according to QUERY_TRACE"""
+    # Always installed: with no trace active a command costs one ContextVar
+    # lookup, and `trace_queries` keeps working once the client exists
+    install_listener()
+    if QUERY_TRACE not in ("sample", "all"):
+        return
+
+    @app.before_request
+    def start_trace():
+        # A trace opened by the caller (e.g. a test) takes precedence
+        if _current.get() is None and _should_trace():
+            trace = QueryTrace(f"{request.method} {request.path}")
+            g.query_trace = (trace, _current.set(trace))
+
+    @app.after_request
+    def finish_trace(response):
+        pending = g.pop("query_trace", None)
+        if pending is None:
+            return response
+        trace, token = pending
+        _current.reset(token)
+        if trace.explain:
+            from database import db_connection
+            trace.explain_commands(db_connection.client)
+
+        summary = trace.summary()
+        summary["status"] = response.status_code
+        recent_traces.append(summary)
+        response.headers["X-Query-Count"] = str(summary["queries"])
+        response.headers["X-Query-Time-Ms"] = str(summary["query_time_ms"])
+
+        flags = [f"COLLSCAN on {op}" for op in summary["collscans"]]
+        flags += [f"in-memory SORT on {op}" for op in summary["in_memory_sorts"]]
+        if flags or summary["query_time_ms"] >= QUERY_TRACE_SLOW_MS:
+            print(f"⚠️  {trace.label}: {summary['queries']} queries, {summary['query_time_ms']} ms"
+                  + (f" ({', '.join(flags)})" if flags else ""))
+        return response
+
+    @app.teardown_request
+    def drop_trace(exc):
+        # after_request didn't run; don't leak the trace into this thread's next request
+        pending = g.pop("query_trace", None)
+        if pending is not None:
+            _current.reset(pending[1])
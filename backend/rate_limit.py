@@ -0,0 +1,306 @@
+"""Token-bucket rate limits and concurrency caps for expensive routes.
+
+Each rule is a bucket of `burst` tokens refilled at `count` per `period`
+seconds, kept separately per key - client IP, JWT identity, or the email a
+login is attempting. A request spends one token from every bucket that
+applies and is refused with 429 + Retry-After once one runs dry, before any
+bcrypt round or upload starts.
+
+Concurrency caps bound how many requests of a kind a process serves at
+once. Past the cap the request is shed immediately with 503 + Retry-After
+instead of queueing, so uploads and logins can't occupy every worker
+thread while cheap reads wait behind them.
+
+Buckets live in this process by default (`LocalBucketStore`). With several
+workers or hosts, set RATE_LIMIT_REDIS_URL to share them through Redis
+(pip install redis). If the shared store is unreachable, requests are let
+through rather than failing closed.
+
+Rules are overridden per name, e.g. RATE_LIMIT_LOGIN_IP="20/60:40" (20 per
+60 s, burst 40); "off" disables one. Caps: CONCURRENCY_LIMIT_UPLOAD=8.
+RATE_LIMIT_ENABLED=false turns limiting off entirely.
+"""
+import functools
+import hashlib
+import math
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from metrics import SHED_REQUESTS
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+LOCAL_MAX_KEYS = 100000
+
+# name -> (count, period seconds, burst)
+DEFAULT_RULES = {
+    "login_ip": (10, 60, 20),
+    "login_account": (5, 60, 5),        # credential stuffing against one account
+    "register_ip": (5, 600, 5),
+    "upload_user": (30, 60, 10),
+    "export_user": (6, 60, 2),
+    "import_user": (2, 60, 1),
+}
+DEFAULT_CONCURRENCY = {
+    "auth": 16,      # login + register; each holds a bcrypt slot
+    "upload": 8,
+    "export": 2,
+    "import": 1,
+}
+
+
+class Rule:
+    def __init__(self, name, count, period, burst):
+        self.name = name
+        self.rate = count / period      # tokens per second
+        self.burst = burst
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, rate={self.rate:.3f}/s, burst={self.burst})"
+
+
+def parse_rule(name, default):
+    """`count/period[:burst]` from RATE_LIMIT_<NAME>, else `default`; None if off"""
+    raw = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if raw is None:
+        return Rule(name, *default)
+    if raw.strip().lower() == "off":
+        return None
+    rate, _, burst = raw.partition(":")
+    count, _, period = rate.partition("/")
+    count, period = float(count), float(period or 1)
+    return Rule(name, count, period, float(burst) if burst else count)
+
+
+RULES = {name: parse_rule(name, default) for name, default in DEFAULT_RULES.items()}
+
+
+class LocalBucketStore:
+    """In-process buckets; the stand-in for a shared store"""
+
+    name = "local"
+
+    def __init__(self, max_keys=LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """Spend `cost` tokens; returns seconds to wait (0 when allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (cost - tokens) / rate
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # Drop the oldest half; a dropped bucket just restarts full
+        oldest = sorted(self._buckets.items(), key=lambda item: item[1][1])
+        for key, _ in oldest[:len(oldest) // 2]:
+            del self._buckets[key]
+
+
+# Refill and spend atomically on the Redis server, using its clock so hosts
+# with skewed clocks agree
+_REDIS_TAKE = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """Buckets shared by every worker and host through Redis"""
+
+    name = "redis"
+
+    def __init__(self, url, prefix="ratelimit:"):
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self._take = self._client.register_script(_REDIS_TAKE)
+
+    def take(self, key, rate, burst, cost=1):
+        return float(self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+
+
+class ConcurrencyCap:
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.shed = 0
+
+    def try_acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.shed += 1
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class RateLimiter:
+    def __init__(self, store, rules=RULES, concurrency=None):
+        self.store = store
+        self.rules = rules
+        self.caps = {
+            name: ConcurrencyCap(name, int(os.getenv(f"CONCURRENCY_LIMIT_{name.upper()}", str(default))))
+            for name, default in (concurrency or DEFAULT_CONCURRENCY).items()
+        }
+        self._lock = threading.Lock()
+        self.limited = {}
+        self.store_errors = 0
+
+    def check(self, rule_name, key):
+        """Seconds until `key` may call again under `rule_name`; 0 when allowed"""
+        rule = self.rules.get(rule_name)
+        if rule is None or key is None:
+            return 0.0
+        try:
+            wait = self.store.take(f"{rule_name}:{key}", rule.rate, rule.burst)
+        except Exception as e:
+            # A broken shared store must not take the API down with it
+            with self._lock:
+                self.store_errors += 1
+            print(f"⚠️  Rate limit store error: {e}")
+            return 0.0
+        if wait > 0:
+            with self._lock:
+                self.limited[rule_name] = self.limited.get(rule_name, 0) + 1
+        return wait
+
+    def stats(self):
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "store": self.store.name,
+            "store_errors": self.store_errors,
+            "rules": {
+                name: ({"per_second": round(rule.rate, 4), "burst": rule.burst} if rule else None)
+                for name, rule in self.rules.items()
+            },
+            "limited": dict(self.limited),
+            "concurrency": {
+                name: {"limit": cap.limit, "in_flight": cap.in_flight, "shed": cap.shed}
+                for name, cap in self.caps.items()
+            },
+        }
+
+
+def client_ip():
+    # Behind a proxy, create_app applies ProxyFix (PROXY_FIX_HOPS) so this is the client
+    return request.remote_addr
+
+
+def current_user():
+    return get_jwt_identity()
+
+
+def login_account():
+    data = request.get_json(silent=True) or {}
+    email = data.get("email")
+    if not email:
+        return None
+    # Hashed so addresses don't end up as keys in a shared store
+    return hashlib.sha256(str(email).strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+def too_many(wait):
+    return jsonify({"error": "Too many requests, slow down"}), 429, {"Retry-After": str(max(1, math.ceil(wait)))}
+
+
+def limit(*rules, concurrency=None):
+    """Decorate a view with rate-limit rules and an optional concurrency cap.
+
+    `rules` are `(rule_name, key_function)` pairs; put this below
+    `@jwt_required()` when a key needs the JWT identity.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return view(*args, **kwargs)
+
+            limiter = get_rate_limiter()
+            route = request.url_rule.rule if request.url_rule else view.__name__
+            wait = max((limiter.check(name, key_fn()) for name, key_fn in rules), default=0.0)
+            if wait > 0:
+                SHED_REQUESTS.labels(route, "rate_limit").inc()
+                return too_many(wait)
+
+            cap = limiter.caps.get(concurrency) if concurrency else None
+            if cap is None:
+                return view(*args, **kwargs)
+            if not cap.try_acquire():
+                SHED_REQUESTS.labels(route, "concurrency").inc()
+                return jsonify({"error": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                cap.release()
+                raise
+            if response.is_streamed:
+                # Streamed bodies (exports) hold the slot until sent
+                response.call_on_close(cap.release)
+            else:
+                cap.release()
+            return response
+        return wrapper
+    return decorator
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Get the process-wide limiter (Redis-backed when RATE_LIMIT_REDIS_URL is set)"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                if RATE_LIMIT_REDIS_URL and redis is None:
+                    print("⚠️  RATE_LIMIT_REDIS_URL is set but redis is not installed (pip install redis); "
+                          "rate limits are per process")
+                if RATE_LIMIT_REDIS_URL and redis is not None:
+                    store = RedisBucketStore(RATE_LIMIT_REDIS_URL)
+                else:
+                    store = LocalBucketStore()
+                _rate_limiter = RateLimiter(store)
+    return _rate_limiter
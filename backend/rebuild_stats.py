@@ -0,0 +1,23 @@
+"""Recompute dashboard counters and rollups from the certificates collection.
+
+    python rebuild_stats.py
+
+Run once after deploying the stats endpoint, or whenever the counters are
+suspected to have drifted. Writes arriving while it runs may be lost from
+the counters, so prefer a quiet period.
+"""
+import time
+
+from database import get_certificates_collection, get_database
+from stats import CertificateStats
+
+
+def main():
+    db = get_database().db
+    started = time.perf_counter()
+    counters, rollups = CertificateStats(db.stats, db.stats_rollups).rebuild(get_certificates_collection())
+    print(f"✅ Rebuilt {counters} counters and {rollups} rollup buckets in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Indexed search over certificates and their owners.
+
+A query `q` matches a certificate when
+
+* its owner's name or email starts with `q` (case-insensitive), via the
+  indexed `name_search` / `email_search` fields on users, or
+* its title or file name contains the words of `q`, via the certificates
+  text index.
+
+Owner matches rank first, newest upload first: a query that prefixes
+someone's name is almost always a lookup of that person. Text matches
+follow by text score and exclude the owners already listed, so the two
+lists never overlap and paging through them is stable. Results are paged
+with an opaque offset cursor, capped at MAX_SEARCH_OFFSET because ranked
+results can't be seeked by key. Without `q`, the filters alone use the
+regular keyset pagination.
+"""
+import base64
+import json
+import re
+
+from pagination import InvalidPageRequest
+
+SEARCH_OWNER_LIMIT = 200
+MAX_SEARCH_OFFSET = 1000
+TEXT_INDEX_NAME = "certificate_search_text"
+
+
+def normalize_search(value):
+    return " ".join(str(value or "").split()).lower()
+
+
+def user_search_fields(name, email):
+    """Indexed, normalized copies of the fields owners are searched by"""
+    return {"name_search": normalize_search(name), "email_search": normalize_search(email)}
+
+
+def encode_offset(offset):
+    raw = json.dumps({"o": offset}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_offset(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["o"])
+    except Exception:
+        raise InvalidPageRequest("Invalid cursor")
+    if not 0 <= offset <= MAX_SEARCH_OFFSET:
+        raise InvalidPageRequest(f"Search results are limited to the first {MAX_SEARCH_OFFSET}")
+    return offset
+
+
+def find_owner_ids(users_collection, q, limit=SEARCH_OWNER_LIMIT):
+    """`user_id` values (both stored forms) of users whose name or email starts with `q`"""
+    prefix = {"$regex": "^" + re.escape(normalize_search(q))}
+    users = users_collection.find(
+        {"$or": [{"name_search": prefix}, {"email_search": prefix}]}, {"_id": 1}
+    ).limit(limit)
+    # Certificates store the owner as the JWT identity string; older ones as an ObjectId
+    return [form for u in users for form in (str(u["_id"]), u["_id"])]
+
+
+def search_certificates(certificates_collection, users_collection, q, filters, projection, limit, offset=0):
+    """One page of ranked results; returns `(docs, next_offset)`"""
+    wanted = offset + limit + 1
+    # An explicit user_id filter already fixes the owner; only titles can match
+    owner_ids = [] if "user_id" in filters else find_owner_ids(users_collection, q)
+
+    owner_matches = []
+    if owner_ids:
+        owner_matches = list(
+            certificates_collection.find({**filters, "user_id": {"$in": owner_ids}}, projection)
+            .sort([("uploaded_at", -1), ("_id", -1)]).limit(wanted)
+        )
+        for doc in owner_matches:
+            doc["match"] = "owner"
+
+    text_matches = []
+    # Fewer than `wanted` owner matches means that's all of them, so the
+    # text results' position in the combined list is known exactly
+    if len(owner_matches) < wanted:
+        text_query = {**filters, "$text": {"$search": q}}
+        if owner_ids:
+            text_query["user_id"] = {"$nin": owner_ids}
+        text_skip = max(0, offset - len(owner_matches))
+        text_matches = list(
+            certificates_collection.find(text_query, {**projection, "score": {"$meta": "textScore"}})
+            .sort([("score", {"$meta": "textScore"}), ("_id", -1)])
+            .skip(text_skip).limit(wanted - len(owner_matches) - text_skip)
+        )
+        for doc in text_matches:
+            doc["match"] = "text"
+
+    docs = owner_matches[offset:] + text_matches
+    next_offset = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        if offset + limit <= MAX_SEARCH_OFFSET:
+            next_offset = offset + limit
+    return docs, next_offset
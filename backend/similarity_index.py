@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from datetime import datetime
+from itertools import combinations
+
+from dotenv import load_dotenv
+
+from versions import ORIGINALS_SCOPE
+
+load_dotenv()
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit hashes under Hamming distance.
+
+    Each hash is split into `blocks` 16-bit substrings, each with its own
+    bucket table. By the pigeonhole principle a hash within distance k of the
+    query matches it to within k // blocks bits on at least one substring,
+    so a query only probes the buckets of nearby substrings and verifies the
+    few candidates found there instead of scanning every hash.
+    """
+
+    def __init__(self, bits=64, blocks=4):
+        self.blocks = blocks
+        self.block_bits = bits // blocks
+        self._mask = (1 << self.block_bits) - 1
+        self._tables = [{} for _ in range(blocks)]
+        self._hashes = []
+        self._items = []
+
+    @property
+    def size(self):
+        return len(self._hashes)
+
+    def _substrings(self, value):
+        return [(value >> (i * self.block_bits)) & self._mask for i in range(self.blocks)]
+
+    def _neighbours(self, sub, radius):
+        """Every substring within `radius` bits of `sub`"""
+        yield sub
+        for r in range(1, radius + 1):
+            for bits in combinations(range(self.block_bits), r):
+                flipped = sub
+                for bit in bits:
+                    flipped ^= 1 << bit
+                yield flipped
+
+    def add(self, value, item):
+        index = len(self._hashes)
+        self._hashes.append(value)
+        self._items.append(item)
+        for table, sub in zip(self._tables, self._substrings(value)):
+            table.setdefault(sub, []).append(index)
+
+    def search(self, value, max_distance):
+        """Return `(distance, item)` pairs within `max_distance`, nearest first"""
+        radius = max_distance // self.blocks
+        seen = set()
+        results = []
+        for table, sub in zip(self._tables, self._substrings(value)):
+            for probe in self._neighbours(sub, radius):
+                for index in table.get(probe, ()):
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    distance = hamming(value, self._hashes[index])
+                    if distance <= max_distance:
+                        results.append((distance, self._items[index]))
+
+        results.sort(key=lambda r: r[0])
+        return results
+
+
+class SimilarityIndex:
+    """Perceptual hashes of every original, queryable by Hamming distance.
+
+    Fingerprints are added to Original_data by `build_fingerprints.py` and
+    imports, usually in another process; those bump the "originals" version
+    marker, and `start` rebuilds the index whenever it moves.
+    """
+
+    def __init__(self, poll_seconds=0):
+        self.poll_seconds = poll_seconds
+        self._index = MultiIndexHash()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.loaded_at = None
+        self.version = None
+
+    def _marker(self, markers):
+        try:
+            return markers.get(ORIGINALS_SCOPE)
+        except Exception as e:
+            print(f"⚠️  Similarity index version check failed: {e}")
+            return None
+
+    def start(self, collection, markers):
+        """Load now and reload in the background when the originals marker changes"""
+        self.load(collection, markers)
+        if self.poll_seconds <= 0 or self._thread:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.poll_seconds)
+                version = self._marker(markers)
+                if version is not None and version != self.version:
+                    self.load(collection, markers)
+
+        self._thread = threading.Thread(target=watch, name="similarity-index-refresh", daemon=True)
+        self._thread.start()
+
+    def load(self, collection, markers=None):
+        """(Re)build the index from `Original_data.phash`"""
+        version = self._marker(markers) if markers is not None else None
+        index = MultiIndexHash()
+        try:
+            cursor = collection.find({"phash": {"$exists": True}}, {"phash": 1}).batch_size(10000)
+            for doc in cursor:
+                index.add(int(doc["phash"], 16), doc["_id"])
+        except Exception as e:
+            print(f"⚠️  Similarity index load failed: {e}")
+            return
+        with self._lock:
+            self._index = index
+            self.loaded_at = datetime.utcnow()
+            self.version = version
+        print(f"✅ Similarity index loaded: {index.size} originals")
+
+    def add(self, phash, original_id):
+        with self._lock:
+            self._index.add(int(phash, 16), original_id)
+
+    def nearest(self, phash, max_distance, limit=10):
+        """`(distance, original_id)` pairs for originals within `max_distance`"""
+        return self._index.search(int(phash, 16), max_distance)[:limit]
+
+    def stats(self):
+        return {
+            "size": self._index.size,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "version": self.version,
+        }
+
+
+similarity_index = SimilarityIndex(
+    poll_seconds=float(os.getenv("SIMILARITY_INDEX_POLL_SECONDS", "5")),
+)
+
+
+def get_similarity_index():
+    """Get the process-wide similarity index"""
+    return similarity_index
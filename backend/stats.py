@@ -0,0 +1,136 @@
+"""Incrementally maintained dashboard statistics.
+
+Counters live in the `stats` collection: one "certificates" document with
+the overall total and per-status counts, plus one "user:<id>" document per
+owner. Hourly and daily rollups of uploads and review outcomes live in
+`stats_rollups`. Every upload and status change applies its increments in a
+single bulk_write, so reading the dashboard numbers is a couple of point
+lookups however many certificates exist.
+
+`rebuild` recomputes everything from the certificates collection with
+aggregations, for first deployment or after drift.
+"""
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+GLOBAL_STATS_ID = "certificates"
+ROLLUP_GRANULARITIES = {
+    "hour": "%Y-%m-%dT%H",
+    "day": "%Y-%m-%d",
+}
+
+
+def user_stats_id(user_id):
+    return f"user:{user_id}"
+
+
+def _bucket_start(at, granularity):
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_update(at, inc):
+    """Upserts adding `inc` to the hour and day buckets containing `at`"""
+    return [
+        UpdateOne(
+            {"_id": f"{granularity}:{at.strftime(fmt)}"},
+            {"$inc": inc, "$setOnInsert": {"granularity": granularity, "bucket": _bucket_start(at, granularity)}},
+            upsert=True,
+        )
+        for granularity, fmt in ROLLUP_GRANULARITIES.items()
+    ]
+
+
+class CertificateStats:
+    def __init__(self, stats_collection, rollups_collection):
+        self.stats = stats_collection
+        self.rollups = rollups_collection
+
+    def _counter_updates(self, user_id, inc):
+        updates = [UpdateOne({"_id": GLOBAL_STATS_ID}, {"$inc": inc}, upsert=True)]
+        if user_id:
+            updates.append(UpdateOne({"_id": user_stats_id(user_id)}, {"$inc": inc}, upsert=True))
+        return updates
+
+    def record_upload(self, user_id, status, at=None):
+        at = at or datetime.utcnow()
+        self.stats.bulk_write(
+            self._counter_updates(user_id, {"total": 1, f"by_status.{status}": 1}), ordered=False
+        )
+        self.rollups.bulk_write(_rollup_update(at, {"uploads": 1}), ordered=False)
+
+    def record_status_changes(self, changes, at=None):
+        """Apply `(user_id, old_status, new_status)` transitions"""
+        at = at or datetime.utcnow()
+        counter_updates, rollup_inc = [], {}
+        for user_id, old_status, new_status in changes:
+            if old_status == new_status:
+                continue
+            inc = {f"by_status.{new_status}": 1}
+            if old_status:
+                inc[f"by_status.{old_status}"] = -1
+            counter_updates.extend(self._counter_updates(user_id, inc))
+            if new_status in ("verified", "rejected"):
+                rollup_inc[new_status] = rollup_inc.get(new_status, 0) + 1
+
+        if counter_updates:
+            self.stats.bulk_write(counter_updates, ordered=False)
+        if rollup_inc:
+            self.rollups.bulk_write(_rollup_update(at, rollup_inc), ordered=False)
+
+    def summary(self, user_id=None):
+        doc = self.stats.find_one({"_id": user_stats_id(user_id) if user_id else GLOBAL_STATS_ID}) or {}
+        return {"total": doc.get("total", 0), "by_status": doc.get("by_status", {})}
+
+    def rollup(self, granularity, limit):
+        """Most recent `limit` buckets, oldest first"""
+        docs = list(
+            self.rollups.find({"granularity": granularity}, {"_id": 0, "granularity": 0})
+            .sort("bucket", -1).limit(limit)
+        )
+        docs.reverse()
+        for doc in docs:
+            doc["bucket"] = doc["bucket"].isoformat()
+        return docs
+
+    def rebuild(self, certificates_collection):
+        """Recompute every counter and rollup from the certificates themselves"""
+        counters = {}
+        pipeline = [{"$group": {"_id": {"user_id": "$user_id", "status": "$status"}, "n": {"$sum": 1}}}]
+        for row in certificates_collection.aggregate(pipeline, allowDiskUse=True):
+            user_id, status, n = row["_id"].get("user_id"), row["_id"].get("status") or "unknown", row["n"]
+            for key in (GLOBAL_STATS_ID, user_stats_id(user_id) if user_id else None):
+                if not key:
+                    continue
+                doc = counters.setdefault(key, {"_id": key, "total": 0, "by_status": {}})
+                doc["total"] += n
+                doc["by_status"][status] = doc["by_status"].get(status, 0) + n
+
+        rollups = {}
+
+        def add(field, date_field, extra_match):
+            for granularity, fmt in ROLLUP_GRANULARITIES.items():
+                pipeline = [
+                    {"$match": {date_field: {"$type": "date"}, **extra_match}},
+                    {"$group": {"_id": {"$dateToString": {"format": fmt, "date": f"${date_field}"}},
+                                "n": {"$sum": 1}}},
+                ]
+                for row in certificates_collection.aggregate(pipeline, allowDiskUse=True):
+                    bucket = datetime.strptime(row["_id"], fmt)
+                    key = f"{granularity}:{row['_id']}"
+                    doc = rollups.setdefault(key, {"_id": key, "granularity": granularity, "bucket": bucket})
+                    doc[field] = doc.get(field, 0) + row["n"]
+
+        add("uploads", "uploaded_at", {})
+        add("verified", "reviewed_at", {"status": "verified"})
+        add("rejected", "reviewed_at", {"status": "rejected"})
+
+        self.stats.delete_many({})
+        if counters:
+            self.stats.insert_many(list(counters.values()))
+        self.rollups.delete_many({})
+        if rollups:
+            self.rollups.insert_many(list(rollups.values()))
+        return len(counters), len(rollups)
@@ -0,0 +1,220 @@
+"""Pluggable storage for certificate files.
+
+Two engines share one interface (put, open, exists, delete, stat):
+
+* `CloudinaryStorage` - the hosted store used so far; keys are Cloudinary
+  public ids and files are served from Cloudinary URLs.
+* `LocalStorage` - a content-addressed directory tree for on-prem
+  deployments; keys are SHA-256 digests and files are served by the API
+  itself with Range support and strong ETags.
+
+Select one with STORAGE_BACKEND=cloudinary|local.
+"""
+import hashlib
+import os
+import tempfile
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+@contextmanager
+def _open_source(source):
+    """Binary stream for a path, a werkzeug FileStorage or a file object"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        stream = getattr(source, "stream", source)
+        stream.seek(0)
+        yield stream
+
+
+class StorageBackend:
+    name = None
+    serves_locally = False
+    # True when thumbnails/previews come from URL transformations, not stored files
+    transforms = False
+
+    def put(self, source, file_name=None, sha256=None, folder="academic_certificates"):
+        """Store a path or file-like object; returns {"key", "url", "size"}"""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Readable binary stream of the stored file"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def stat(self, key):
+        """{"size", "etag"} for the stored file, or None if missing"""
+        raise NotImplementedError
+
+    def derivative_url(self, key, kind):
+        """URL of a "thumbnail" / "preview" rendition, for engines that transform"""
+        return None
+
+
+# Cloudinary transformations per derivative: first page, bounded width
+CLOUDINARY_DERIVATIVES = {
+    "thumbnail": {"format": "jpg", "transformation": [
+        {"page": 1, "width": 320, "crop": "limit", "quality": "auto", "fetch_format": "auto"}]},
+    "preview": {"format": "png", "transformation": [
+        {"page": 1, "width": 1200, "crop": "limit"}]},
+}
+
+
+class CloudinaryStorage(StorageBackend):
+    name = "cloudinary"
+    transforms = True
+
+    @property
+    def _uploader(self):
+        # Imported and configured on first use so startup never needs credentials
+        import cloudinary_config
+        return cloudinary_config.get_uploader()
+
+    def put(self, source, file_name=None, sha256=None, folder="academic_certificates"):
+        result = self._uploader.upload(
+            source,
+            folder=folder,
+            resource_type="auto"   # auto handles PDF, PNG, JPG etc.
+        )
+        return {"key": result["public_id"], "url": result["secure_url"], "size": result.get("bytes")}
+
+    def _resource(self, key):
+        import cloudinary.api
+        import cloudinary.exceptions
+        self._uploader  # makes sure cloudinary.config() has run
+        try:
+            return cloudinary.api.resource(key)
+        except cloudinary.exceptions.NotFound:
+            return None
+
+    def open(self, key):
+        resource = self._resource(key)
+        if not resource:
+            raise FileNotFoundError(key)
+        return urllib.request.urlopen(resource["secure_url"], timeout=30)
+
+    def exists(self, key):
+        return self._resource(key) is not None
+
+    def delete(self, key):
+        self._uploader.destroy(key)
+
+    def stat(self, key):
+        resource = self._resource(key)
+        if not resource:
+            return None
+        return {"size": resource.get("bytes"), "etag": resource.get("etag")}
+
+    def derivative_url(self, key, kind):
+        # Rendered and cached by Cloudinary's CDN on first request; only
+        # images and PDFs (stored as resource_type "image") can be transformed
+        import cloudinary.utils
+        import cloudinary_config
+        if cloudinary_config.USE_FAKE:
+            return None
+        self._uploader  # makes sure cloudinary.config() has run
+        url, _ = cloudinary.utils.cloudinary_url(
+            key, resource_type="image", secure=True, **CLOUDINARY_DERIVATIVES[kind]
+        )
+        return url
+
+
+class LocalStorage(StorageBackend):
+    """Files stored at root/ab/cd/<sha256>; identical content is stored once"""
+
+    name = "local"
+    serves_locally = True
+
+    def __init__(self, root, url_prefix="/api/files"):
+        self.root = Path(root)
+        self.url_prefix = url_prefix
+
+    def path(self, key):
+        if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+            raise ValueError("Invalid storage key")
+        return self.root / key[:2] / key[2:4] / key
+
+    def url(self, key):
+        return f"{self.url_prefix}/{key}"
+
+    def put(self, source, file_name=None, sha256=None, folder="academic_certificates"):
+        if sha256 and self.path(sha256).exists():
+            return {"key": sha256, "url": self.url(sha256), "size": self.path(sha256).stat().st_size}
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as out, _open_source(source) as src:
+                while True:
+                    chunk = src.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            key = digest.hexdigest()
+            target = self.path(key)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return {"key": key, "url": self.url(key), "size": target.stat().st_size}
+
+    def open(self, key):
+        return open(self.path(key), "rb")
+
+    def exists(self, key):
+        try:
+            return self.path(key).exists()
+        except ValueError:
+            return False
+
+    def delete(self, key):
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def stat(self, key):
+        try:
+            st = self.path(key).stat()
+        except (FileNotFoundError, ValueError):
+            return None
+        # Content-addressed: the key is the SHA-256, so it is a strong ETag
+        return {"size": st.st_size, "etag": key, "mtime": st.st_mtime}
+
+
+_storage = None
+
+
+def get_storage():
+    """Get the configured storage engine"""
+    global _storage
+    if _storage is None:
+        backend = os.getenv("STORAGE_BACKEND", "cloudinary").lower()
+        if backend == "local":
+            root = os.getenv("LOCAL_STORAGE_DIR", Path(__file__).resolve().parent / "storage")
+            _storage = LocalStorage(root)
+        elif backend == "cloudinary":
+            _storage = CloudinaryStorage()
+        else:
+            raise EnvironmentError(f"Unknown STORAGE_BACKEND: {backend}")
+    return _storage
@@ -0,0 +1,59 @@
+"""Thumbnail and preview derivatives of certificate files.
+
+Lists show a small thumbnail (WebP, JPEG where Pillow lacks WebP) and the
+detail view a first-page PNG preview, instead of the multi-megabyte
+original. Both are rendered once per distinct file by the extraction
+pipeline and stored content-addressed next to the original. Engines that
+can transform on the fly (Cloudinary) skip rendering and hand out
+transformation URLs instead - see `StorageBackend.derivative_url`.
+"""
+import io
+
+from fingerprint import render_first_page
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+DERIVATIVE_KINDS = ("thumbnail", "preview")
+THUMBNAIL_WIDTH = 320
+PREVIEW_WIDTH = 1200
+# Renders A4 a little above PREVIEW_WIDTH so the preview is downscaled, not blown up
+PREVIEW_DPI = 150
+
+
+def _fit(image, width):
+    image = image.copy()
+    image.thumbnail((width, width * 4), Image.LANCZOS)
+    return image
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def render_derivatives(data, file_name=""):
+    """{"thumbnail": (bytes, content_type), "preview": (...)}; empty if the file can't be rendered"""
+    if Image is None:
+        return {}
+    page = render_first_page(data, file_name, dpi=PREVIEW_DPI)
+    if page is None:
+        return {}
+    # Phone photos are stored sideways with an EXIF rotation flag
+    page = ImageOps.exif_transpose(page)
+    if page.mode not in ("RGB", "L"):
+        page = page.convert("RGB")
+
+    thumbnail = _fit(page, THUMBNAIL_WIDTH)
+    if features.check("webp"):
+        thumbnail_file = (_encode(thumbnail, "WEBP", quality=75, method=4), "image/webp")
+    else:
+        thumbnail_file = (_encode(thumbnail, "JPEG", quality=80, optimize=True, progressive=True), "image/jpeg")
+
+    return {
+        "thumbnail": thumbnail_file,
+        "preview": (_encode(_fit(page, PREVIEW_WIDTH), "PNG", optimize=True), "image/png"),
+    }
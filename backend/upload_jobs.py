@@ -0,0 +1,188 @@
+import os
+import socket
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+UPLOAD_QUEUE_DEPTH = int(os.getenv("UPLOAD_QUEUE_DEPTH", "64"))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "certificate_spool"))
+# A job claimed longer ago than this is assumed to belong to a dead worker
+UPLOAD_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv("UPLOAD_CLAIM_TIMEOUT_SECONDS", "1800")))
+
+
+def upload_owner():
+    """`host:pid` of this process, recorded on the jobs it is pushing"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_exited(owner):
+    """True only for an owner on this host whose process is gone"""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+class UploadQueue:
+    """Bounded pool that pushes spooled certificate files to storage.
+
+    At most `workers` uploads run at once and at most `max_pending` are
+    queued or running; `reserve` fails fast once that depth is reached so the
+    request can be shed instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers=UPLOAD_WORKERS, max_pending=UPLOAD_QUEUE_DEPTH, spool_dir=UPLOAD_SPOOL_DIR):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.spool_dir = spool_dir
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        # Called as (user_id, old_status, new_status) whenever a job changes a certificate
+        self.on_certificate_change = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+        return self._executor
+
+    def spool(self, file):
+        """Save an incoming upload to the local spool directory"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, uuid.uuid4().hex)
+        file.stream.seek(0)
+        file.save(path)
+        return path
+
+    def claim_fields(self):
+        """Fields marking a new "uploading" certificate as this process's job"""
+        return {"upload_owner": upload_owner(), "upload_claimed_at": datetime.utcnow()}
+
+    def reserve(self):
+        """Claim a queue slot; False when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.pending += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def submit(self, certificates_collection, storage, cert_id, spool_path, sha256=None):
+        """Run the upload for a reserved slot in the background"""
+        future = self._get_executor().submit(
+            self._run, certificates_collection, storage, cert_id, spool_path, sha256
+        )
+        future.add_done_callback(lambda _: self.release())
+        return future
+
+    def _run(self, certificates_collection, storage, cert_id, spool_path, sha256):
+        try:
+            stored = storage.put(spool_path, sha256=sha256)
+            cert = certificates_collection.find_one_and_update(
+                {"_id": cert_id, "status": "uploading"},
+                {"$set": {
+                    "certificate_url": stored["url"],
+                    "public_id": stored["key"],
+                    "storage": storage.name,
+                    "status": "pending",
+                    "uploaded_at": datetime.utcnow(),
+                }, "$unset": {"spool_path": "", "upload_owner": "", "upload_claimed_at": ""}},
+                projection={"user_id": 1}
+            )
+            new_status = "pending"
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            print(f"❌ Upload job {cert_id} failed: {e}")
+            cert = certificates_collection.find_one_and_update(
+                {"_id": cert_id, "status": "uploading"},
+                {"$set": {"status": "upload_failed", "upload_error": str(e)},
+                 "$unset": {"spool_path": "", "upload_owner": "", "upload_claimed_at": ""}},
+                projection={"user_id": 1}
+            )
+            new_status = "upload_failed"
+            with self._lock:
+                self.failed += 1
+        finally:
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
+
+        if cert and self.on_certificate_change:
+            self.on_certificate_change(cert.get("user_id"), "uploading", new_status)
+
+    def recover(self, certificates_collection, storage):
+        """Requeue uploads whose worker died, failing ones whose spool file is gone.
+
+        Every API worker runs this at startup, so a job is only touched once
+        its owner is known to be dead - a process on this host that has
+        exited, or a claim older than UPLOAD_CLAIM_TIMEOUT - and is then
+        claimed by compare-and-set on the owner seen here, so exactly one
+        worker resubmits or fails it.
+        """
+        stale_before = datetime.utcnow() - UPLOAD_CLAIM_TIMEOUT
+        projection = {"spool_path": 1, "sha256": 1, "user_id": 1,
+                      "upload_owner": 1, "upload_claimed_at": 1, "uploaded_at": 1}
+        for cert in certificates_collection.find({"status": "uploading"}, projection):
+            owner = cert.get("upload_owner")
+            # Jobs from before owners were recorded fall back to their upload time
+            claimed_at = cert.get("upload_claimed_at") or cert.get("uploaded_at")
+            if not (_owner_exited(owner) or (claimed_at and claimed_at < stale_before)):
+                continue
+
+            claim = {"_id": cert["_id"], "status": "uploading", "upload_owner": owner}
+            path = cert.get("spool_path")
+            if not path or not os.path.exists(path):
+                failed = certificates_collection.find_one_and_update(
+                    claim,
+                    {"$set": {"status": "upload_failed", "upload_error": "Spooled file lost"},
+                     "$unset": {"spool_path": "", "upload_owner": "", "upload_claimed_at": ""}},
+                    projection={"user_id": 1}
+                )
+                # Same stats / ETag bookkeeping as a job that failed in-process
+                if failed and self.on_certificate_change:
+                    self.on_certificate_change(failed.get("user_id"), "uploading", "upload_failed")
+            elif self.reserve():
+                claimed = certificates_collection.find_one_and_update(claim, {"$set": self.claim_fields()})
+                if claimed:
+                    self.submit(certificates_collection, storage, cert["_id"], path, cert.get("sha256"))
+                else:
+                    self.release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+upload_queue = UploadQueue()
+
+
+def get_upload_queue():
+    """Get the process-wide upload queue"""
+    return upload_queue
@@ -0,0 +1,57 @@
+"""Cheap change markers for conditional GETs.
+
+One counter document per scope in the `versions` collection: a global
+"certificates" scope plus one "user:<id>" scope per certificate owner.
+Every write that changes what a list or detail response would show bumps
+the relevant counters, and read endpoints derive their ETag from the
+counter alone, so an unchanged poll is answered with 304 without reading
+any certificate. An "originals" scope tracks Original_data the same way, so
+each process's original registry knows when to reload.
+"""
+import hashlib
+
+from pymongo import UpdateOne
+
+CERTIFICATES_SCOPE = "certificates"
+# Bumped by every write to Original_data; in-process registries reload on it
+ORIGINALS_SCOPE = "originals"
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+class VersionMarkers:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def bump(self, *scopes):
+        """Increment every given scope in one round trip"""
+        scopes = list(dict.fromkeys(s for s in scopes if s))
+        if not scopes:
+            return
+        self.collection.bulk_write(
+            [UpdateOne({"_id": scope}, {"$inc": {"v": 1}}, upsert=True) for scope in scopes],
+            ordered=False,
+        )
+
+    def bump_certificates(self, user_ids=()):
+        """Record a change to certificates owned by `user_ids`"""
+        self.bump(CERTIFICATES_SCOPE, *(user_scope(u) for u in user_ids if u))
+
+    def bump_originals(self):
+        """Record a change to Original_data"""
+        self.bump(ORIGINALS_SCOPE)
+
+    def get(self, scope):
+        doc = self.collection.find_one({"_id": scope})
+        return doc["v"] if doc else 0
+
+    def etag(self, scope, *variant):
+        """ETag for a response that only changes when `scope` is bumped.
+
+        `variant` holds whatever else shapes the response (caller role,
+        query string) so different views of the same data never share a tag.
+        """
+        raw = "|".join([scope, str(self.get(scope)), *map(str, variant)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()